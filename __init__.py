@@ -2,11 +2,17 @@ from automate_fund_correlation import (convert_str_to_float,
                                        read_data,
                                        calculate_correlation,
                                        plot_correlation_heatmaps,
+                                       kendall_tau,
+                                       PearsonIndex,
+                                       rolling_correlation,
+                                       correlation_matrix,
+                                       universe_correlation,
                                        return_files_name,
                                        return_csv_filename,
                                         )
 from fund_analysis_function import (read_forexfactory_data,
                                     convert_monthly_to_daily,
+                                    expand_to_daily,
                                     combine_daily_data,
                                     read_investing_daily_data,
                                     return_files_name,
@@ -17,6 +23,8 @@ from fund_analysis_function import (read_forexfactory_data,
                                     return_price,
                                     get_redundant_pairs,
                                     get_top_abs_correlations,
+                                    corr_with_target,
+                                    lagged_correlation,
                                     get_top_corr_with_gold,
                                     create_new_time_features,
                                     create_nonlinear_features,
@@ -27,11 +35,15 @@ from fund_analysis_function import (read_forexfactory_data,
                                     create_folder,
                                     count_depression_value,
                                     count_inflation_value,
+                                    aggregate_by_period,
                                     count_monthly_price_change,
                                     compare_depression_with_price_change,
                                     compare_depression_of_2countries,
+                                    contingency_table,
+                                    compare_pairs,
                                     merge_csv,
                                     news_effect_with_periods,
+                                    event_study,
                                     feature_analysis,
                                     comparing,
                                     count_ones_zeros,
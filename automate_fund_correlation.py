@@ -3,9 +3,7 @@ import pandas as pd
 import os
 import pickle
 
-import plotly.graph_objects as go
-from plotly.offline import plot
-import pandas as pd
+from data_loader import load_investing_data, parse_numeric, Panel
 
 import warnings
 import sys
@@ -18,22 +16,468 @@ if not sys.warnoptions:
 def convert_str_to_float(df: pd.DataFrame) -> pd.DataFrame:
     '''
     The convert_str_to_float function takes a Pandas DataFrame as input and converts the string data types in each column to float.
-    The function iterates through each column in the DataFrame, and for each column, it iterates through each row.
-    If a particular cell in the DataFrame is of type string, the function removes any commas in the string to convert it to a numeric float value.
-    Finally, the function converts the column to float using the astype method.
+    Each column is converted in a single vectorized pass by 'parse_numeric', which removes commas, trailing '%' signs
+    and expands the K/M/B suffixes of investing.com volumes. Numeric columns are only cast to float.
     The function modifies the input DataFrame in-place, and returns the modified DataFrame as output.
-    Note that the function assumes that each string value in the DataFrame can be converted to a float after removing commas.
+    Note that the function assumes that each string value in the DataFrame can be converted to a float after this cleaning.
     If a value cannot be converted to a float, the function will raise an error.
     '''
     for column in df.columns:
-        for k in range(len(df[column])):
-            if type(df[column][k]) == str:
-                df[column][k] = df[column][k].replace(",","")
-        df[column] = df[column].astype(float)      
+        df[column] = parse_numeric(df[column], errors='raise')
 
     return df 
 
 
+def _tied_pairs(sorted_values: np.ndarray) -> int:
+    '''
+    Return the number of pairs of equal values, sum of t*(t-1)/2 over the groups of t equal values of a sorted array.
+    '''
+    if len(sorted_values) == 0:
+        return 0
+    starts = np.flatnonzero(np.r_[True, sorted_values[1:] != sorted_values[:-1], True])
+    counts = np.diff(starts).astype(np.int64)
+    return int((counts * (counts - 1) // 2).sum())
+
+
+def count_inversions(values: np.ndarray) -> int:
+    '''
+    Count the pairs i < j with values[i] > values[j] (equal values are not inversions) with a bottom-up merge sort.
+
+    Each level of the merge sort is done for all the blocks at once with numpy: the values are turned into integer ranks, and the block
+    of each element is added to its key, so one stable sort merges the two sorted halves of every block. The sort (timsort) merges
+    sorted runs in linear time, and the merged position of every right element tells how many left elements are not greater than it,
+    so the inversions are counted without searching. This is O(n) per level and O(n log n) overall, without any Python loop over the elements.
+
+    Parameters:
+        values (np.ndarray): A one dimensional array of comparable values without NaN.
+
+    Returns:
+        int: The number of inversions.
+
+    Example Usage:
+        count_inversions(np.array([3, 1, 2]))   # 2
+    '''
+    n = len(values)
+    if n < 2:
+        return 0
+    ranks = np.unique(values, return_inverse=True)[1].astype(np.int64)
+    span = np.int64(ranks.max() + 1)
+    positions = np.arange(n, dtype=np.int64)
+
+    inversions = 0
+    merged = np.empty(n, dtype=np.int64)
+    width = 1
+    while width < n:
+        pair = positions // (2 * width)
+        keys = pair * span + ranks
+        order = np.argsort(keys, kind='stable')
+        merged[order] = positions
+        # A right element has a full left half before it. Equal left elements stay before it in the stable merge,
+        # so its merged offset minus its offset in the right half is the number of left elements not greater than it
+        is_right = (positions // width) % 2 == 1
+        right_offset = positions[is_right] - width
+        inversions += int((width - (merged[is_right] - right_offset)).sum())
+        ranks = keys[order] - pair * span
+        width *= 2
+    return inversions
+
+
+def kendall_tau(x, y) -> float:
+    '''
+    Calculate the Kendall tau-b correlation of two series in O(n log n), with Knight's algorithm.
+
+    The pairs are sorted by x then y, so the discordant pairs are the inversions of y (count_inversions), and the ties in x, in y
+    and in both are counted from the sorted values. Pairs with a missing value are skipped, like pandas' Series.corr(method='kendall'),
+    whose result is matched to floating point tolerance.
+
+    Parameters:
+        x (array-like): The first series.
+        y (array-like): The second series, of the same length.
+
+    Returns:
+        float: The Kendall tau-b correlation, NaN if there are less than 2 pairs or if one of the series is constant.
+
+    Example Usage:
+        # Kendall correlation of two columns, also usable as a pandas correlation method
+        tau = kendall_tau(df['High US Dollar Index'], df['High US Wheat'])
+        matrix = df.corr(method=kendall_tau)
+    '''
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    valid = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[valid], y[valid]
+    n = len(x)
+    if n < 2:
+        return np.nan
+
+    order = np.lexsort((y, x))
+    x, y = x[order], y[order]
+
+    total_pairs = n * (n - 1) // 2
+    x_ties = _tied_pairs(x)
+    y_ties = _tied_pairs(np.sort(y))
+    # Pairs tied in both x and y: runs of equal (x, y) in the lexsorted order
+    starts = np.flatnonzero(np.r_[True, (x[1:] != x[:-1]) | (y[1:] != y[:-1]), True])
+    counts = np.diff(starts).astype(np.int64)
+    joint_ties = int((counts * (counts - 1) // 2).sum())
+
+    denominator = np.sqrt(float(total_pairs - x_ties) * float(total_pairs - y_ties))
+    if denominator == 0:
+        return np.nan
+    discordant = count_inversions(y)
+    return (total_pairs - x_ties - y_ties + joint_ties - 2 * discordant) / denominator
+
+
+def pearson_from_sums(n, sum_x, sum_y, sum_xx, sum_yy, sum_xy, tolerance: float = 0.0):
+    '''
+    Pearson correlation from the number of pairs and the sums of x, y, x^2, y^2 and xy (scalars or arrays).
+    NaN where there are less than 2 pairs or a series is constant: its sum of squared deviations is not above tolerance * n.
+    The default tolerance of 0 suits sums computed directly, sums computed with FFTs need one above their rounding noise.
+    '''
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sum_xy - sum_x * sum_y / n
+        var_x = sum_xx - sum_x * sum_x / n
+        var_y = sum_yy - sum_y * sum_y / n
+        corr = cov / np.sqrt(var_x * var_y)
+    corr = np.where((n >= 2) & (var_x > tolerance * n) & (var_y > tolerance * n), corr, np.nan)
+    return np.clip(corr, -1.0, 1.0)
+
+
+class PearsonIndex:
+    '''
+    Prefix sums of two aligned series, to get their Pearson correlation over any date range in constant time.
+
+    The series are aligned on the union of their dates, and the cumulative number of pairs where both values exist and the cumulative
+    sums of x, y, x^2, y^2 and xy over these pairs are stored once. The correlation over [start, end] is then computed from the
+    differences of the sums at both ends of the range, found with np.searchsorted: O(1) per range after an O(n) build,
+    whatever the length of the range. The values are centered on their means before summing, which keeps the sums accurate.
+
+    Parameters:
+        x (pd.Series): The first series, with a datetime index.
+        y (pd.Series): The second series, with a datetime index.
+
+    Example Usage:
+        index = PearsonIndex(df_dxy['High US Dollar Index'], df_wheat['High US Wheat'])
+        index.corr('2010-01-01', '2020-01-01')
+
+        # Correlation of every calendar year, and of a few thousand windows at once
+        index.yearly()
+        index.corr_many(starts, ends)
+    '''
+
+    def __init__(self, x: pd.Series, y: pd.Series):
+        df = pd.concat([x, y], axis=1).sort_index(kind='mergesort')
+        self.dates = df.index
+        values = df.to_numpy(dtype=np.float64)
+        valid = ~np.isnan(values).any(axis=1)
+        centered = np.where(valid[:, None], values - np.nanmean(values[valid], axis=0) if valid.any() else values, 0.0)
+        a, b = centered[:, 0], centered[:, 1]
+        columns = np.column_stack([valid, a, b, a * a, b * b, a * b])
+        self.sums = np.vstack([np.zeros((1, 6)), np.cumsum(columns, axis=0)])
+
+    def _positions(self, starts, ends):
+        '''Prefix positions of the rows with start <= date <= end, an end given as 'YYYY' or 'YYYY-MM' covers the whole year or month'''
+        starts = pd.DatetimeIndex(pd.to_datetime(np.atleast_1d(starts))).values
+        ends = np.atleast_1d(ends)
+        if ends.dtype.kind in 'UO':
+            ends = [pd.Period(end).end_time if isinstance(end, str) and len(end.strip()) in (4, 7) else end for end in ends]
+        ends = pd.DatetimeIndex(pd.to_datetime(ends)).values
+        return (np.searchsorted(self.dates.values, starts, side='left'),
+                np.searchsorted(self.dates.values, ends, side='right'))
+
+    def corr_many(self, starts, ends) -> np.ndarray:
+        '''
+        Pearson correlations over many date ranges [starts[i], ends[i]] (inclusive) in one vectorized step.
+
+        Parameters:
+            starts (array-like): The first dates of the ranges, in any format understood by pd.to_datetime ('YYYY', 'YYYY-MM-DD', Timestamp).
+            ends (array-like): The last dates of the ranges, in the same formats. 'YYYY' and 'YYYY-MM' include the whole year or month,
+                               like pandas' partial date slicing ('2020' ends on 2020-12-31).
+
+        Returns:
+            np.ndarray: One correlation per range, NaN for the ranges with less than 2 pairs.
+        '''
+        first, last = self._positions(starts, ends)
+        last = np.maximum(first, last)
+        n, sum_x, sum_y, sum_xx, sum_yy, sum_xy = (self.sums[last] - self.sums[first]).T
+        return pearson_from_sums(n, sum_x, sum_y, sum_xx, sum_yy, sum_xy)
+
+    def corr(self, start, end) -> float:
+        '''Pearson correlation over the dates start <= date <= end'''
+        return float(self.corr_many([start], [end])[0])
+
+    def count(self, start, end) -> int:
+        '''Number of dates in [start, end] where both series have a value'''
+        first, last = self._positions([start], [end])
+        return int(self.sums[max(first[0], last[0]), 0] - self.sums[first[0], 0])
+
+    def yearly(self) -> pd.Series:
+        '''Pearson correlation of every calendar year of the aligned history, indexed by year'''
+        if len(self.dates) == 0:
+            return pd.Series(dtype=np.float64)
+        years = np.arange(self.dates[0].year, self.dates[-1].year + 1)
+        starts = pd.to_datetime(years.astype(str), format='%Y')
+        ends = starts + pd.DateOffset(years=1) - pd.Timedelta(1, unit='ns')
+        return pd.Series(self.corr_many(starts, ends), index=pd.Index(years, name='year'))
+
+
+def average_ranks(values: np.ndarray, order: np.ndarray = None) -> np.ndarray:
+    '''
+    Rank the values of every row of a 2D array (1 for the smallest), giving tied values their average rank like pandas' rank().
+    All the rows are ranked at once with one argsort, the ties are found on the sorted values.
+
+    Parameters:
+        values (np.ndarray): A 2D array without NaN, ranked along its last axis.
+        order (np.ndarray, optional): The argsort of values along its last axis, when it is already known. Default is None.
+
+    Returns:
+        np.ndarray: The float ranks, with the shape of values.
+    '''
+    rows, n = values.shape
+    if n == 0:
+        return np.zeros((rows, n))
+    if order is None:
+        order = np.argsort(values, axis=1, kind='mergesort')
+    sorted_values = np.take_along_axis(values, order, axis=1)
+    new_group = np.ones((rows, n), dtype=bool)
+    new_group[:, 1:] = sorted_values[:, 1:] != sorted_values[:, :-1]
+    # Number the groups of equal values over all the rows, then average the positions of every group
+    group = np.cumsum(new_group.ravel()) - 1
+    positions = np.tile(np.arange(n, dtype=np.float64), rows)
+    counts = np.bincount(group)
+    average = np.bincount(group, weights=positions) / counts + 1
+    ranks = np.empty((rows, n))
+    np.put_along_axis(ranks, order, average[group].reshape(rows, n), axis=1)
+    return ranks
+
+
+def _resolve_pairs(columns: list, pairs: list = None, against: str = None) -> list:
+    '''Return the (first, second) column pairs: the given pairs, every column against one, or all the pairs of columns'''
+    if pairs is not None:
+        return [tuple(pair) for pair in pairs]
+    if against is not None:
+        return [(against, column) for column in columns if column != against]
+    return [(columns[a], columns[b]) for a in range(len(columns)) for b in range(a + 1, len(columns))]
+
+
+def rolling_correlation(df: pd.DataFrame, window: int, pairs: list = None, against: str = None, method: str = 'pearson',
+                        min_periods: int = None, chunk_size: int = 64) -> pd.DataFrame:
+    '''
+    Calculate the rolling correlations of many pairs of columns at once, e.g. the US Dollar Index against every FX pair and commodity.
+
+    - 'pearson': the windowed sums of x, y, x^2, y^2 and xy (and the number of pairs where both values exist) are differences of
+      cumulative sums, so every step of the window is O(1) and all the pairs of a chunk are computed as one array operation.
+      Windows are pairwise-complete: a row counts for a pair when both of its values exist. Same result as
+      df[first].rolling(window, min_periods).corr(df[second]).
+    - 'spearman': the values of every column are ranked once per window, and the correlations of the ranks of all the pairs are
+      read from one batched product of the centered ranks. Only windows where both columns have all their values are computed,
+      so the ranks of a window are always those of the rows shared by the pair, and every value is the exact Spearman correlation
+      of the window (NaN elsewhere, there is no min_periods for 'spearman').
+
+    Parameters:
+        df (pd.DataFrame): One column per instrument, with a datetime index (e.g. the Close of Panel.to_frame()).
+        window (int): The number of rows of the window (20, 60, 250, ...).
+        pairs (list, optional): The (first, second) column pairs to compute. Default is None.
+        against (str, optional): If pairs is not given, compute this column against every other column. Default is None,
+                                 then all the pairs of columns are computed.
+        method (str, optional): 'pearson' or 'spearman'. Default is 'pearson'.
+        min_periods (int, optional): The minimum number of rows with both values for a Pearson window. Default is window.
+        chunk_size (int, optional): The number of pairs ('pearson') or windows ('spearman') computed at the same time, which bounds the memory used.
+
+    Returns:
+        pd.DataFrame: A (dates x pairs) DataFrame, with one column '[first] vs [second]' per pair, NaN where the window is not complete enough.
+
+    Example Usage:
+        closes = Panel.load().to_frame('Close')
+        dxy_60d = rolling_correlation(closes, 60, against='US Dollar Index')
+        all_250d = rolling_correlation(closes, 250, method='spearman')
+    '''
+    df = df.sort_index(kind='mergesort')
+    columns = list(df.columns)
+    pairs = _resolve_pairs(columns, pairs, against)
+    first = np.array([columns.index(a) for a, _ in pairs], dtype=int)
+    second = np.array([columns.index(b) for _, b in pairs], dtype=int)
+    values = df.to_numpy(dtype=np.float64)
+    valid = ~np.isnan(values)
+    n_rows = len(values)
+    result = np.full((n_rows, len(pairs)), np.nan)
+
+    if method == 'pearson':
+        min_periods = window if min_periods is None else min_periods
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            centered = np.where(valid, values - np.nanmean(values, axis=0), 0.0)
+        # Row t sums the rows max(0, t - window + 1) ... t
+        upper = np.arange(1, n_rows + 1)
+        lower = np.maximum(0, upper - window)
+        for start in range(0, len(pairs), chunk_size):
+            i, j = first[start:start + chunk_size], second[start:start + chunk_size]
+            both = valid[:, i] & valid[:, j]
+            x = np.where(both, centered[:, i], 0.0)
+            y = np.where(both, centered[:, j], 0.0)
+            sums = []
+            for column in (both.astype(np.float64), x, y, x * x, y * y, x * y):
+                cumulative = np.vstack([np.zeros((1, column.shape[1])), np.cumsum(column, axis=0)])
+                sums.append(cumulative[upper] - cumulative[lower])
+            corr = pearson_from_sums(*sums)
+            result[:, start:start + chunk_size] = np.where(sums[0] >= max(min_periods, 1), corr, np.nan)
+
+    elif method == 'spearman':
+        if n_rows >= window:
+            windows = np.lib.stride_tricks.sliding_window_view(values, window, axis=0)      # (window position, column, row)
+            complete = np.lib.stride_tricks.sliding_window_view(valid, window, axis=0).all(axis=2)
+            for start in range(0, len(windows), chunk_size):
+                block = windows[start:start + chunk_size]
+                ranks = average_ranks(np.nan_to_num(block).reshape(-1, window)).reshape(block.shape)
+                ranks -= (window + 1) / 2
+                gram = np.einsum('bnw,bmw->bnm', ranks, ranks)
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    corr = gram[:, first, second] / np.sqrt(gram[:, first, first] * gram[:, second, second])
+                ok = complete[start:start + chunk_size][:, first] & complete[start:start + chunk_size][:, second]
+                result[start + window - 1:start + window - 1 + len(block)] = np.where(ok, np.clip(corr, -1.0, 1.0), np.nan)
+    else:
+        raise ValueError(f"method must be 'pearson' or 'spearman', not {method}")
+
+    return pd.DataFrame(result, index=df.index, columns=[str(a)+' vs '+str(b) for a, b in pairs])
+
+
+def _masked_pearson(values: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    '''
+    Pairwise-complete Pearson matrix of the columns of values, where valid marks the values that exist.
+    All the sums over the rows where both columns exist are read from a few matrix products of the masked values.
+    '''
+    mask = valid.astype(np.float64)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        centered = np.where(valid, values - np.nanmean(np.where(valid, values, np.nan), axis=0), 0.0)
+    n = mask.T @ mask
+    sum_x = centered.T @ mask                  # [i, j]: sum of column i over the rows where column j exists
+    sum_xx = (centered * centered).T @ mask
+    sum_xy = centered.T @ centered
+    corr = pearson_from_sums(n, sum_x, sum_x.T, sum_xx, sum_xx.T, sum_xy)
+    np.fill_diagonal(corr, np.where(np.diag(n) >= 2, 1.0, np.nan))
+    return corr
+
+
+def _masked_spearman(values: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    '''
+    Pairwise-complete Spearman matrix of the columns of values, where valid marks the values that exist.
+    The ranks of a pair are computed on the rows where both columns exist, like pandas' corr(method='spearman').
+    Columns with the same missing rows are grouped, so for every pair of groups the shared rows are ranked once for all their columns.
+    Every column is sorted once: the order of a subset of its rows is its full order without the other rows, so ranking a pair is O(rows).
+    '''
+    groups = {}
+    for column in range(values.shape[1]):
+        groups.setdefault(valid[:, column].tobytes(), []).append(column)
+    groups = [(valid[:, columns[0]], columns) for columns in groups.values()]
+    by_column = np.ascontiguousarray(values.T)
+    orders = np.argsort(by_column, axis=1, kind='mergesort')
+
+    corr = np.full((values.shape[1], values.shape[1]), np.nan)
+    for g, (mask_g, columns_g) in enumerate(groups):
+        for mask_h, columns_h in groups[g:]:
+            same = columns_g is columns_h
+            columns = columns_g if same else columns_g + columns_h
+            rows = mask_g & mask_h
+            # Positions of the shared rows, in the sorted order of every column
+            order = orders[columns]
+            order = order[rows[order]].reshape(len(columns), -1)
+            order = (np.cumsum(rows) - 1)[order]
+            ranks = average_ranks(by_column[columns][:, rows], order=order)
+            ranks -= ranks.mean(axis=1, keepdims=True) if ranks.shape[1] else 0.0
+            sums = ranks.sum(axis=1)
+            squares = (ranks * ranks).sum(axis=1)
+            block = pearson_from_sums(rows.sum(), sums[:, None], sums[None, :], squares[:, None], squares[None, :], ranks @ ranks.T)
+            if same:
+                corr[np.ix_(columns, columns)] = block
+            else:
+                cross = block[:len(columns_g), len(columns_g):]
+                corr[np.ix_(columns_g, columns_h)] = cross
+                corr[np.ix_(columns_h, columns_g)] = cross.T
+
+    np.fill_diagonal(corr, np.where(valid.sum(axis=0) >= 2, 1.0, np.nan))
+    return corr
+
+
+def correlation_matrix(df: pd.DataFrame, methods: tuple = ('pearson', 'spearman', 'kendall')) -> dict:
+    '''
+    Calculate the correlation matrices of all the columns of a DataFrame, with pairwise-complete observations.
+
+    - 'pearson': every pair uses the rows where both columns have a value. The counts and sums of all the pairs are computed at once
+      with matrix products of the masked (zero filled) values, instead of one aligned copy per pair.
+    - 'spearman': every pair is ranked on the rows where both columns have a value, like pandas' corr(method='spearman').
+      Columns with the same missing days (e.g. instruments covering the same dates) are ranked together once per pair of groups,
+      so without missing values all the columns are ranked in a single pass.
+    - 'kendall': kendall_tau on the rows shared by each pair, O(n log n) per pair.
+    The 'count' matrix gives the number of rows shared by each pair.
+
+    Parameters:
+        df (pd.DataFrame): One column per instrument, with NaN for the missing days.
+        methods (tuple, optional): The correlations to compute among 'pearson', 'spearman' and 'kendall'. Default is all three.
+
+    Returns:
+        dict: {'count': DataFrame, method: DataFrame, ...}, every DataFrame indexed by the columns of df on both axes.
+              The correlation of a pair with less than 2 shared rows or with a constant column is NaN.
+
+    Example Usage:
+        closes = Panel.load().to_frame('Close')
+        matrices = correlation_matrix(closes, methods=('pearson', 'spearman'))
+        matrices['pearson'].loc['Gold', 'Silver'], matrices['count'].loc['Gold', 'Silver']
+    '''
+    columns = df.columns
+    values = df.to_numpy(dtype=np.float64)
+    valid = ~np.isnan(values)
+    mask = valid.astype(np.float64)
+    matrices = {'count': pd.DataFrame((mask.T @ mask).astype(np.int64), index=columns, columns=columns)}
+
+    for method in methods:
+        if method == 'pearson':
+            corr = _masked_pearson(values, valid)
+        elif method == 'spearman':
+            corr = _masked_spearman(values, valid)
+        elif method == 'kendall':
+            corr = np.full((len(columns), len(columns)), np.nan)
+            for a in range(len(columns)):
+                for b in range(a, len(columns)):
+                    both = valid[:, a] & valid[:, b]
+                    corr[a, b] = corr[b, a] = kendall_tau(values[both, a], values[both, b]) if a != b else (1.0 if both.sum() >= 2 else np.nan)
+        else:
+            raise ValueError(f"unknown method {method}, use 'pearson', 'spearman' or 'kendall'")
+        matrices[method] = pd.DataFrame(corr, index=columns, columns=columns)
+
+    return matrices
+
+
+def universe_correlation(path: str = 'investing_data', field: str = 'Close', instruments: list = None, start_date: str = None,
+                         end_date: str = None, methods: tuple = ('pearson', 'spearman', 'kendall')) -> dict:
+    '''
+    Calculate the correlation matrices of all the instruments of a folder (the 57 files of investing_data by default).
+
+    The instruments are loaded and aligned once with Panel.load (through the binary cache of data_loader),
+    so rebuilding the matrices after a data refresh only re-reads the files that changed.
+
+    Parameters:
+        path (str, optional): The folder of the investing.com CSV files. Default is 'investing_data'.
+        field (str, optional): 'Open', 'High', 'Low' or 'Close'. Default is 'Close'.
+        instruments (list, optional): The file names to use. Default is None, every CSV of the folder.
+        start_date (str, optional): The first date used (inclusive), 'YYYY-MM-DD' or 'YYYY'. Default is None.
+        end_date (str, optional): The last date used (inclusive), 'YYYY-MM-DD' or 'YYYY'. Default is None.
+        methods (tuple, optional): The correlations to compute. Default is ('pearson', 'spearman', 'kendall').
+
+    Returns:
+        dict: The matrices of correlation_matrix, {'count': ..., 'pearson': ..., 'spearman': ..., 'kendall': ...}.
+
+    Example Usage:
+        matrices = universe_correlation(start_date='2010', end_date='2023', methods=('pearson', 'spearman'))
+    '''
+    df = Panel.load(instruments, path=path, fields=[field]).to_frame(field)
+    if start_date is not None:
+        df = df[df.index >= start_date]
+    if end_date is not None:
+        df = df[df.index <= end_date]
+    return correlation_matrix(df, methods=methods)
+
+
 def read_data(path:str, file_name:str, column_name_for_corr:str,) -> pd.DataFrame:
     '''
     Read and preprocess time-series data from a CSV file.
@@ -44,8 +488,8 @@ def read_data(path:str, file_name:str, column_name_for_corr:str,) -> pd.DataFram
         column_name_for_corr (str): The name of the column for correlation analysis.
 
     Returns:
-        pd.DataFrame: A Pandas DataFrame with two columns: "Date" and the specified column_name_for_corr.
-                      The "Date" column is set as the DataFrame's index.
+        pd.DataFrame: A Pandas DataFrame with the specified column_name_for_corr as float, indexed by the sorted "Date".
+                      The file is served from the binary cache of load_investing_data when the CSV is unchanged.
 
     Example Usage:
         # Define the path to the directory where the CSV files are located
@@ -57,26 +501,16 @@ def read_data(path:str, file_name:str, column_name_for_corr:str,) -> pd.DataFram
         # Read and preprocess data2.csv
         data2 = read_data(data_path, 'data2', 'Sales')
     '''    
-    columns_to_keep = ['Date']
-    columns_to_keep.append(column_name_for_corr)
-    df = pd.read_csv(path+'/'+file_name+'.csv')
-    try:
-        df.index = pd.to_datetime(df["Date"], format="%b %d, %Y")
-    except:
-        try:
-            df.index = pd.to_datetime(df["Date"], format="%m/%d/%Y") 
-        except:
-            df.index = pd.to_datetime(df["Date"], format="%d/%m/%Y") 
-            
-    df.sort_index(axis=0, ascending=True, inplace=True)
-    df = df.drop(columns=[col for col in df.columns if col not in columns_to_keep])
-    df = df.rename(columns={column_name_for_corr: column_name_for_corr+' '+file_name})
-    df = convert_str_to_float(df.drop(columns=['Date']))
+    # investing.com calls the close 'Price'
+    source_column = 'Price' if column_name_for_corr == 'Close' else column_name_for_corr
+    df = load_investing_data(file_name=file_name, path=path)
+    df = df[[source_column]].rename(columns={source_column: column_name_for_corr+' '+file_name})
     return df
 
 def calculate_correlation(df1:  pd.DataFrame, df2:  pd.DataFrame, start_date: str, end_date: str):
     '''
     Calculate Pearson, Kendall, and Spearman correlations between two DataFrames over a specified date range.
+    The Kendall correlation is computed in O(n log n) by kendall_tau. For many date ranges of the same pair of series, use PearsonIndex.
 
     Parameters:
         df1 (pd.DataFrame): The first DataFrame containing time-series data.
@@ -96,7 +530,7 @@ def calculate_correlation(df1:  pd.DataFrame, df2:  pd.DataFrame, start_date: st
     filtered_df = df_combined[(df_combined.index >= start_date) & (df_combined.index <= end_date)]
     
     pearson_corr = filtered_df[filtered_df.columns[0]].corr(filtered_df[filtered_df.columns[1]], method='pearson')
-    kendall_corr = filtered_df[filtered_df.columns[0]].corr(filtered_df[filtered_df.columns[1]], method='kendall')
+    kendall_corr = kendall_tau(filtered_df[filtered_df.columns[0]], filtered_df[filtered_df.columns[1]])
     spearman_corr = filtered_df[filtered_df.columns[0]].corr(filtered_df[filtered_df.columns[1]], method='spearman')
     
     print(f"Pearson correlation between {df1.columns[0]} and {df2.columns[0]} is {abs(pearson_corr)}")
@@ -129,16 +563,22 @@ def plot_correlation_heatmaps(df1, df2, start_date, end_date):
 
     Returns:
         None: The function displays correlation heatmaps using Plotly for Pearson, Kendall, and Spearman correlations.
+              Plotly is imported on the first call, so the rest of the module does not need it.
+              The three matrices are computed by correlation_matrix, the Kendall one in O(n log n) per pair of columns.
 
     Example Usage:
         # Plot correlation heatmaps between two DataFrames
         plot_correlation_heatmaps(data1, data2, '2010', '2023')
     '''    
+    import plotly.graph_objects as go
+    from plotly.offline import plot
+
     df_combined = pd.concat([df1, df2], axis=1)
     df_combined = df_combined.dropna()
     filtered_df = df_combined[(df_combined.index >= start_date) & (df_combined.index <= end_date)]
 
-    correlations = filtered_df.corr(method='pearson'), filtered_df.corr(method='kendall'), filtered_df.corr(method='spearman')
+    matrices = correlation_matrix(filtered_df, methods=('pearson', 'kendall', 'spearman'))
+    correlations = matrices['pearson'], matrices['kendall'], matrices['spearman']
     correlation_methods = ['Pearson', 'Kendall', 'Spearman']
 
     for correlation, method in zip(correlations, correlation_methods):
@@ -0,0 +1,76 @@
+"""
+import_time.py
+
+Benchmark the cold import time of the analysis modules, each in a fresh interpreter,
+and check that the heavy optional dependencies (selenium, webdriver_manager, plotly, xlwt)
+are not imported until a function that needs them is called.
+
+
+Usage:
+    - from the repository root
+        python benchmarks/import_time.py
+
+    - more runs per module, and fail if a module takes longer than 1.5 seconds to import
+        python benchmarks/import_time.py --runs 10 --max-seconds 1.5
+"""
+
+
+
+## Import Libraries
+import os
+import sys
+import json
+import argparse
+import subprocess
+from statistics import median
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ['data_loader', 'fund_analysis_function', 'automate_fund_correlation', 'investing', 'main']
+HEAVY_MODULES = ['selenium', 'webdriver_manager', 'plotly', 'xlwt']
+
+SNIPPET = """
+import sys, json, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'heavy': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def time_import(module: str, runs: int = 5) -> dict:
+    """Import module in `runs` fresh interpreters, return the median time and the heavy modules it loaded"""
+
+    env = dict(os.environ, PYTHONPATH=ROOT, PYTHONWARNINGS='ignore')
+    seconds, heavy = [], set()
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', SNIPPET.format(module=module, heavy=HEAVY_MODULES)],
+                                cwd=ROOT, env=env, capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        seconds.append(result['seconds'])
+        heavy.update(result['heavy'])
+    return {'module': module, 'seconds': median(seconds), 'heavy': sorted(heavy)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters per module')
+    parser.add_argument('--max-seconds', type=float, default=None, help='fail when a median import time is above this')
+    args = parser.parse_args(argv)
+
+    failed = False
+    print(f"{'module':<28}{'median (s)':>12}  heavy modules loaded")
+    for module in MODULES:
+        result = time_import(module, runs=args.runs)
+        print(f"{module:<28}{result['seconds']:>12.3f}  {', '.join(result['heavy']) or '-'}")
+        if result['heavy']:
+            failed = True
+        if args.max_seconds is not None and result['seconds'] > args.max_seconds:
+            failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+kendall.py
+
+Benchmark kendall_tau against the O(n^2) pairwise definition of Kendall tau-b and,
+when scipy is installed, against pandas' Series.corr(method='kendall'),
+on random walks (no ties) and on rounded random walks (many ties).
+
+
+Usage:
+    - from the repository root, at 10k and 100k rows
+        python benchmarks/kendall.py
+
+    - also run the O(n^2) reference at 100k rows (a few minutes)
+        python benchmarks/kendall.py --pairwise-max 100000
+
+    - other sizes
+        python benchmarks/kendall.py --sizes 1000 1000000
+"""
+
+
+
+## Import Libraries
+import os
+import sys
+import argparse
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from automate_fund_correlation import kendall_tau
+
+
+def pairwise_kendall(x: np.ndarray, y: np.ndarray, cells: int = 4_000_000) -> float:
+    """Kendall tau-b from the sign of every pair, in O(n^2) time, `cells` pairs at a time"""
+    chunk = max(1, cells // max(len(x), 1))
+    score, x_untied, y_untied = 0, 0, 0
+    for start in range(0, len(x), chunk):
+        dx = np.sign(x[start:start + chunk, None] - x[None, :])
+        dy = np.sign(y[start:start + chunk, None] - y[None, :])
+        # Only the pairs (i, j) with i < j
+        upper = np.arange(start, start + len(dx))[:, None] < np.arange(len(x))[None, :]
+        score += int((dx * dy)[upper].sum())
+        x_untied += int((dx[upper] != 0).sum())
+        y_untied += int((dy[upper] != 0).sum())
+    return score / np.sqrt(float(x_untied) * float(y_untied))
+
+
+def pandas_kendall(x: np.ndarray, y: np.ndarray):
+    """pandas' Kendall correlation, None if scipy is not installed"""
+    try:
+        return pd.Series(x).corr(pd.Series(y), method='kendall')
+    except ImportError:
+        return None
+
+
+def timed(function, *args):
+    start = perf_counter()
+    result = function(*args)
+    return result, perf_counter() - start
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000], help='numbers of rows')
+    parser.add_argument('--pairwise-max', type=int, default=20_000, help='largest size checked against the O(n^2) reference')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    failed = False
+    print(f"{'rows':>9} {'data':>6} {'kendall_tau (s)':>16} {'pandas (s)':>11} {'pairwise (s)':>13} {'max abs diff':>13}")
+    for size in args.sizes:
+        x = rng.standard_normal(size).cumsum()
+        y = 0.5 * x + rng.standard_normal(size).cumsum()
+        for data, (a, b) in [('walk', (x, y)), ('ties', (np.round(x), np.round(y)))]:
+            tau, tau_seconds = timed(kendall_tau, a, b)
+            references, cells = [], []
+            pandas_tau, pandas_seconds = timed(pandas_kendall, a, b)
+            if pandas_tau is not None:
+                references.append(pandas_tau)
+                cells.append(f"{pandas_seconds:>11.3f}")
+            else:
+                cells.append(f"{'no scipy':>11}")
+            if size <= args.pairwise_max:
+                pairwise_tau, pairwise_seconds = timed(pairwise_kendall, a, b)
+                references.append(pairwise_tau)
+                cells.append(f"{pairwise_seconds:>13.3f}")
+            else:
+                cells.append(f"{'-':>13}")
+            difference = max((abs(tau - reference) for reference in references), default=None)
+            failed |= difference is not None and difference > 1e-9
+            cells.append(f"{difference:>13.2e}" if difference is not None else f"{'-':>13}")
+            print(f"{size:>9} {data:>6} {tau_seconds:>16.4f} {' '.join(cells)}")
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
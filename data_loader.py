@@ -0,0 +1,505 @@
+"""
+data_loader.py
+
+Cached reader for the investing.com CSV files stored in investing_data/.
+
+The raw CSVs are parsed once, cleaned (dates, thousands separators, percent signs,
+K/M/B volume suffixes, junk index columns) and stored as a binary .npz file next to them, in a '.cache'
+folder. Each cache entry records the path, size and mtime of the CSV it was built
+from, so updating or editing a CSV invalidates its cache entry automatically.
+
+
+Usage:
+    - load a single instrument (DatetimeIndex named 'Date', float columns)
+        dxy = load_investing_data('US Dollar Index')
+
+    - load from another folder
+        df = load_investing_data('EURUSD', path='../../data/fund')
+
+    - append scraped rows newer than the last stored date
+        append_investing_data('EURUSD', scraped_df)
+
+    - drop every cache entry of a folder
+        clear_cache('investing_data')
+
+    - align several instruments (or all of investing_data) in one array
+        panel = Panel.load(['EURUSD', 'Gold', 'US Dollar Index'])
+        gold_close = panel.series('Gold', 'Close')
+        closes = panel.to_frame('Close')
+
+    - parse a date column, remembering its format for the next call with the same key
+        index = parse_dates(df['Date'], key='investing_data/EURUSD.csv')
+
+    - load Forex Factory release histories (.xlsx), parsing the uncached ones in 4 processes
+        releases = load_forexfactory_files(['CPI m/m', 'Trade Balance'], path='monthly', workers=4)
+        cpi = releases['CPI m/m']['Actual']
+"""
+
+
+
+## Import Libraries
+import os
+import logging
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import numpy as np
+
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+
+# Config
+
+CACHE_FOLDER = '.cache'
+
+# Bump when the layout or the cleaning rules of the cached frames change
+CACHE_VERSION = 2
+
+# Columns kept from the investing.com CSVs, in this order
+VALUE_COLUMNS = ['Price', 'Open', 'High', 'Low', 'Vol.', 'Change %']
+
+# Suffixes used by investing.com in the 'Vol.' column
+VOLUME_SUFFIXES = {'K': 1e3, 'M': 1e6, 'B': 1e9}
+
+# Default fields of a Panel, 'Close' is read from the 'Price' column
+PANEL_FIELDS = ['Open', 'High', 'Low', 'Close']
+
+# Date formats seen in the investing.com CSVs, tried in this order
+DATE_FORMATS = ["%b %d, %Y", "%m/%d/%Y", "%d/%m/%Y", "%Y-%m-%d"]
+
+# Number of evenly spaced dates used to guess the format of a column
+SNIFF_SAMPLE_SIZE = 200
+
+# Columns kept from the Forex Factory release histories, in this order
+FOREXFACTORY_COLUMNS = ['Actual', 'Forecast', 'Previous']
+
+# Format of the dates in the 'History' column of the Forex Factory files ("Tue, 2023 Jan 10")
+FOREXFACTORY_DATE_FORMAT = " %Y %b %d"
+
+# Date format detected for each instrument (keyed by CSV path), filled by parse_dates
+DATE_FORMAT_CACHE = {}
+
+
+# Helper functions
+
+def _parse_with_format(dates: pd.Series, date_format: str):
+    """Parse dates with a fixed format, return None if any date doesn't match it"""
+    try:
+        return pd.DatetimeIndex(pd.to_datetime(dates, format=date_format))
+    except (ValueError, TypeError):
+        return None
+
+
+def _cache_path(csv_path: str, cache_dir: str = None) -> str:
+    """Return the .npz cache file used for csv_path (other files keep their extension in the name)"""
+    folder, file = os.path.split(csv_path)
+    if cache_dir is None:
+        cache_dir = os.path.join(folder, CACHE_FOLDER)
+    name, extension = os.path.splitext(file)
+    if extension != '.csv':
+        name = file
+    return os.path.join(cache_dir, name + '.npz')
+
+
+def _source_key(csv_path: str) -> dict:
+    """Identify a CSV by its absolute path, size and modification time"""
+    stat = os.stat(csv_path)
+    return {'source': os.path.abspath(csv_path),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns}
+
+
+def _read_cache(cache_file: str, key: dict):
+    """Return the cached frame if it was built from the same CSV, else None"""
+    try:
+        with np.load(cache_file, allow_pickle=False) as cache:
+            if (int(cache['version']) != CACHE_VERSION
+                    or str(cache['source']) != key['source']
+                    or int(cache['size']) != key['size']
+                    or int(cache['mtime_ns']) != key['mtime_ns']):
+                return None
+            index = pd.DatetimeIndex(cache['dates'].astype('datetime64[ns]'), name='Date')
+            return pd.DataFrame(cache['values'], index=index, columns=list(cache['columns']))
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _write_cache(cache_file: str, key: dict, df: pd.DataFrame) -> None:
+    """
+    Write the cleaned frame atomically, so concurrent readers never see half a file:
+    every writer (process or thread) gets its own temporary file, renamed over the entry once complete
+    """
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    temp_file = None
+    try:
+        descriptor, temp_file = tempfile.mkstemp(dir=os.path.dirname(cache_file),
+                                                 prefix=os.path.basename(cache_file) + '.', suffix='.tmp')
+        with os.fdopen(descriptor, 'wb') as f:
+            np.savez(f,
+                     version=CACHE_VERSION,
+                     source=key['source'],
+                     size=key['size'],
+                     mtime_ns=key['mtime_ns'],
+                     dates=df.index.to_numpy(dtype='datetime64[ns]').view(np.int64),
+                     values=df.to_numpy(dtype=np.float64),
+                     columns=np.array(df.columns, dtype=str))
+        os.replace(temp_file, cache_file)
+    except OSError as e:
+        logger.warning(f"could not write cache {cache_file}: {str(e)}")
+        if temp_file is not None and os.path.exists(temp_file):
+            os.remove(temp_file)
+
+
+# Main functions
+
+def parse_numeric(column: pd.Series, dtype=np.float64, errors: str = 'coerce') -> np.ndarray:
+    """
+    Convert an investing.com text column to floats in one vectorized pass:
+    - Thousands separators are removed ('13,787.92' -> 13787.92)
+    - A trailing '%' is removed ('-0.66%' -> -0.66)
+    - K/M/B suffixes are expanded ('1.07B' -> 1.07e9)
+    Numeric columns are only cast to dtype. Missing cells stay NaN. Values that still can't be parsed become NaN,
+    or raise a ValueError with errors='raise'.
+    """
+    if pd.api.types.is_numeric_dtype(column):
+        return column.to_numpy(dtype=dtype)
+
+    present = column.notna().to_numpy()
+    text = column[present].astype(str)
+    text = text.str.strip().str.replace(',', '', regex=False).str.rstrip('%')
+
+    multiplier = text.str[-1:].str.upper().map(VOLUME_SUFFIXES)
+    has_suffix = multiplier.notna().to_numpy()
+    if has_suffix.any():
+        text = text.where(~has_suffix, text.str[:-1])
+
+    parsed = pd.to_numeric(text, errors=errors).to_numpy(dtype=np.float64)
+    if has_suffix.any():
+        parsed = parsed * multiplier.fillna(1.0).to_numpy(dtype=np.float64)
+
+    values = np.full(len(column), np.nan)
+    values[present] = parsed
+    return values.astype(dtype, copy=False)
+
+
+def sniff_date_format(dates: pd.Series, sample_size: int = SNIFF_SAMPLE_SIZE):
+    """
+    Guess the format of a date column from an evenly spaced sample of it.
+    Returns the first format of DATE_FORMATS matching the whole sample, or None.
+    Spreading the sample over the column makes it very likely to contain a day
+    above 12, which is what tells "%m/%d/%Y" and "%d/%m/%Y" apart.
+    """
+    values = dates.dropna()
+    if values.empty:
+        return None
+
+    positions = np.unique(np.linspace(0, len(values) - 1, sample_size).astype(int))
+    sample = values.iloc[positions]
+
+    for date_format in DATE_FORMATS:
+        if _parse_with_format(sample, date_format) is not None:
+            return date_format
+    return None
+
+
+def parse_dates(dates: pd.Series, key: str = None) -> pd.DatetimeIndex:
+    """
+    Parse a date column with a single fixed-format pass:
+    - Reuse the format remembered for key (usually the CSV path) if it still matches
+    - Otherwise sniff the format from a sample, validate it on the full column and remember it
+    If validation fails the other known formats are tried, then pandas format inference.
+    """
+    known_format = DATE_FORMAT_CACHE.get(key)
+    if known_format is not None:
+        parsed = _parse_with_format(dates, known_format)
+        if parsed is not None:
+            return parsed
+
+    sniffed_format = sniff_date_format(dates)
+    candidates = [sniffed_format] if sniffed_format is not None else []
+    candidates += [date_format for date_format in DATE_FORMATS if date_format != sniffed_format]
+
+    for date_format in candidates:
+        parsed = _parse_with_format(dates, date_format)
+        if parsed is not None:
+            if key is not None:
+                DATE_FORMAT_CACHE[key] = date_format
+            return parsed
+
+    logger.warning(f"unknown date format for {key}, falling back to format inference")
+    return pd.DatetimeIndex(pd.to_datetime(dates))
+
+
+def drop_duplicate_dates(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Keep one row per date of a date-indexed frame, the last one:
+    - Scraped rows are appended after the stored ones, so the last row of a date is the newest
+    - The sorts of this module are stable, which keeps that order
+    compact_investing_data, Panel.load and align_frames all resolve duplicated dates with it.
+    """
+    return df[~df.index.duplicated(keep='last')]
+
+
+def clean_raw_investing_data(df: pd.DataFrame, key: str = None) -> pd.DataFrame:
+    """
+    Clean a frame read with pd.read_csv from an investing.com CSV:
+    - Drop rows without a date (side tables scraped along with the history)
+    - Parse 'Date' into a sorted DatetimeIndex named 'Date' with parse_dates (key is passed on to it)
+    - Keep the price, volume and change columns and convert them to float64
+    - Drop junk columns like 'Unnamed: 0'
+    Duplicated dates are kept, callers decide how to handle them.
+    """
+    df = df.dropna(subset=['Date'])
+    index = parse_dates(df['Date'], key=key).astype('datetime64[ns]')
+    index.name = 'Date'
+
+    columns = [column for column in VALUE_COLUMNS if column in df.columns]
+    clean_df = pd.DataFrame({column: parse_numeric(df[column]) for column in columns}, index=index)
+
+    return clean_df.sort_index(kind='mergesort')
+
+
+def load_investing_data(file_name: str, path: str = 'investing_data', use_cache: bool = True,
+                        cache_dir: str = None) -> pd.DataFrame:
+    """
+    Load a cleaned investing.com CSV, going through the binary cache:
+    - Return the cached frame if path, size and mtime of the CSV still match
+    - Otherwise parse the CSV, clean it and refresh the cache entry
+    A new DataFrame is returned on every call, so callers are free to modify it.
+    """
+    csv_path = os.path.join(path, file_name + '.csv')
+    if not use_cache:
+        return clean_raw_investing_data(pd.read_csv(csv_path), key=os.path.abspath(csv_path))
+
+    key = _source_key(csv_path)
+    cache_file = _cache_path(csv_path, cache_dir)
+
+    df = _read_cache(cache_file, key)
+    if df is None:
+        df = clean_raw_investing_data(pd.read_csv(csv_path), key=key['source'])
+        _write_cache(cache_file, key, df)
+
+    return df
+
+
+def compact_investing_data(file_name: str, path: str = 'investing_data', force: bool = False) -> bool:
+    """
+    Rewrite an investing.com CSV once in its canonical layout:
+    - Drop the 'Unnamed: 0', 'Unnamed: 0.1', ... index columns left by older full rewrites
+    - Drop rows without a date and keep only the last stored row of every date
+    - Sort the rows by date, oldest first, so that appended rows keep the file in order
+    The cell text is kept as it is. Nothing is done if the header is already canonical,
+    unless force=True. Returns True if the file was rewritten.
+    """
+    csv_path = os.path.join(path, file_name + '.csv')
+    canonical_columns = ['Date'] + VALUE_COLUMNS
+
+    header = pd.read_csv(csv_path, nrows=0).columns
+    if not force and all(column in canonical_columns for column in header):
+        return False
+
+    raw = pd.read_csv(csv_path, dtype=str).dropna(subset=['Date'])
+    raw.index = parse_dates(raw['Date'], key=os.path.abspath(csv_path))
+
+    raw = drop_duplicate_dates(raw)
+    order = np.argsort(raw.index.to_numpy(), kind='mergesort')
+
+    columns = [column for column in canonical_columns if column in raw.columns]
+    raw.iloc[order][columns].to_csv(csv_path, index=False)
+
+    return True
+
+
+def append_investing_data(file_name: str, rows: pd.DataFrame, path: str = 'investing_data') -> int:
+    """
+    Append freshly scraped rows to the tail of an investing.com CSV without rewriting it:
+    - Find the last stored date (from the cache)
+    - Keep only the rows strictly newer than it, one per date, oldest first
+    - Append them in the columns and date format of the CSV
+    - Extend the cache entry with the same rows, so the next load doesn't reparse the CSV
+    The I/O on the CSV is proportional to the number of new rows. Returns that number.
+    """
+    csv_path = os.path.join(path, file_name + '.csv')
+    stored = load_investing_data(file_name=file_name, path=path)
+    last_date = stored.index.max() if len(stored) else pd.Timestamp.min
+
+    rows = rows.dropna(subset=['Date'])
+    dates = parse_dates(rows['Date']).astype('datetime64[ns]')
+    is_new = np.asarray((dates > last_date) & ~dates.duplicated())
+    rows, dates = rows[is_new], dates[is_new]
+    if rows.empty:
+        return 0
+
+    order = np.argsort(dates.to_numpy(), kind='mergesort')
+    rows, dates = rows.iloc[order], dates[order]
+
+    # Write the dates the way the rest of the file writes them
+    head = pd.read_csv(csv_path, nrows=SNIFF_SAMPLE_SIZE)
+    date_format = (DATE_FORMAT_CACHE.get(os.path.abspath(csv_path))
+                   or sniff_date_format(head['Date'])
+                   or "%m/%d/%Y")
+
+    new_rows = rows.reindex(columns=head.columns)
+    new_rows['Date'] = dates.strftime(date_format)
+
+    with open(csv_path, 'rb+') as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+    new_rows.to_csv(csv_path, mode='a', header=False, index=False)
+
+    new_clean = pd.DataFrame({column: parse_numeric(rows[column]) if column in rows.columns
+                              else np.full(len(rows), np.nan) for column in stored.columns},
+                             index=pd.DatetimeIndex(dates, name='Date'))
+    _write_cache(_cache_path(csv_path), _source_key(csv_path), pd.concat([stored, new_clean]))
+
+    return len(rows)
+
+
+def clean_raw_forexfactory_data(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Clean a frame read with pd.read_excel from a Forex Factory release history:
+    - Parse the date out of 'History' ("Tue, 2023 Jan 10") into a sorted DatetimeIndex named 'Date'
+    - Keep 'Actual', 'Forecast' and 'Previous' and convert them to float64 with parse_numeric
+    Duplicated dates are kept, callers decide how to handle them.
+    """
+    try:
+        dates = df['History'].str.split(',').str[1]
+    except AttributeError:
+        dates = df['History']
+    index = pd.DatetimeIndex(pd.to_datetime(dates, format=FOREXFACTORY_DATE_FORMAT)).astype('datetime64[ns]')
+    index.name = 'Date'
+
+    clean_df = pd.DataFrame({column: parse_numeric(df[column]) for column in FOREXFACTORY_COLUMNS}, index=index)
+
+    return clean_df.sort_index(kind='mergesort')
+
+
+def load_forexfactory_data(file_name: str, path: str, use_cache: bool = True,
+                           cache_dir: str = None) -> pd.DataFrame:
+    """
+    Load a cleaned Forex Factory release history (file_name.xlsx), going through the binary cache
+    like load_investing_data: the Excel file is only parsed again when its size or mtime changed.
+    """
+    excel_path = os.path.join(path, file_name + '.xlsx')
+    if not use_cache:
+        return clean_raw_forexfactory_data(pd.read_excel(excel_path))
+
+    key = _source_key(excel_path)
+    cache_file = _cache_path(excel_path, cache_dir)
+
+    df = _read_cache(cache_file, key)
+    if df is None:
+        df = clean_raw_forexfactory_data(pd.read_excel(excel_path))
+        _write_cache(cache_file, key, df)
+
+    return df
+
+
+def load_forexfactory_files(files: list, path: str, workers: int = None, use_cache: bool = True,
+                            cache_dir: str = None) -> dict:
+    """
+    Load many Forex Factory release histories, returns {file_name: frame} in the order of files:
+    - Files with a valid cache entry are read from it in this process
+    - The others are parsed in a pool of `workers` processes (os.cpu_count() by default),
+      which also write their cache entries
+    """
+    frames = dict()
+    missing = []
+    for file_name in files:
+        excel_path = os.path.join(path, file_name + '.xlsx')
+        df = _read_cache(_cache_path(excel_path, cache_dir), _source_key(excel_path)) if use_cache else None
+        if df is None:
+            missing.append(file_name)
+        else:
+            frames[file_name] = df
+
+    if len(missing) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed = executor.map(load_forexfactory_data, missing, [path] * len(missing),
+                                  [use_cache] * len(missing), [cache_dir] * len(missing))
+            frames.update(zip(missing, parsed))
+    else:
+        for file_name in missing:
+            frames[file_name] = load_forexfactory_data(file_name, path, use_cache=use_cache, cache_dir=cache_dir)
+
+    return {file_name: frames[file_name] for file_name in files}
+
+
+def clear_cache(path: str = 'investing_data', cache_dir: str = None) -> None:
+    """Delete all cache entries built for the CSV and Excel files of a folder"""
+    if cache_dir is None:
+        cache_dir = os.path.join(path, CACHE_FOLDER)
+    if not os.path.isdir(cache_dir):
+        return
+    for file in os.listdir(cache_dir):
+        if file.endswith('.npz'):
+            os.remove(os.path.join(cache_dir, file))
+
+
+class Panel:
+    """
+    Instruments aligned on a shared, sorted date axis in one contiguous float array:
+    - values[date, instrument, field], NaN where an instrument has no bar that day
+    - mask[date, instrument], True where the instrument has a bar that day
+    - dates, instruments and fields label the three axes
+    instrument(), field() and series() return views of values, not copies.
+    """
+
+    def __init__(self, values: np.ndarray, dates: pd.DatetimeIndex, instruments: list, fields: list):
+        self.values = values
+        self.dates = dates
+        self.instruments = list(instruments)
+        self.fields = list(fields)
+        self.mask = ~np.isnan(values).all(axis=2)
+        self._instrument_position = {name: i for i, name in enumerate(self.instruments)}
+        self._field_position = {name: i for i, name in enumerate(self.fields)}
+
+    @classmethod
+    def load(cls, instruments: list = None, path: str = 'investing_data', fields: list = PANEL_FIELDS,
+             dtype=np.float64) -> 'Panel':
+        """
+        Load instruments through the cache and align them:
+        - instruments defaults to every CSV of path (all of investing.urls for investing_data)
+        - fields are columns of load_investing_data, 'Close' standing for 'Price'
+        - Duplicated dates of an instrument keep their last row (see drop_duplicate_dates)
+        - No instrument (an empty list or a folder without CSV) gives an empty Panel
+        """
+        if instruments is None:
+            instruments = sorted(file[:-4] for file in os.listdir(path) if file.endswith('.csv'))
+        columns = ['Price' if field == 'Close' else field for field in fields]
+
+        frames = []
+        for name in instruments:
+            df = load_investing_data(file_name=name, path=path)
+            frames.append(drop_duplicate_dates(df).reindex(columns=columns))
+
+        dates = np.unique(np.concatenate([np.array([], dtype='datetime64[ns]')]
+                                         + [df.index.to_numpy(dtype='datetime64[ns]') for df in frames]))
+        values = np.full((len(dates), len(instruments), len(fields)), np.nan, dtype=dtype)
+        for i, df in enumerate(frames):
+            rows = np.searchsorted(dates, df.index.to_numpy(dtype='datetime64[ns]'))
+            values[rows, i, :] = df.to_numpy(dtype=dtype)
+
+        return cls(values, pd.DatetimeIndex(dates, name='Date'), instruments, fields)
+
+    def instrument(self, name: str) -> np.ndarray:
+        """(dates, fields) view of one instrument"""
+        return self.values[:, self._instrument_position[name], :]
+
+    def field(self, field: str) -> np.ndarray:
+        """(dates, instruments) view of one field"""
+        return self.values[:, :, self._field_position[field]]
+
+    def series(self, name: str, field: str) -> np.ndarray:
+        """(dates,) view of one field of one instrument"""
+        return self.values[:, self._instrument_position[name], self._field_position[field]]
+
+    def to_frame(self, field: str = 'Close') -> pd.DataFrame:
+        """One field of every instrument as a (dates x instruments) DataFrame"""
+        return pd.DataFrame(self.field(field), index=self.dates, columns=self.instruments)
@@ -4,12 +4,15 @@ import os
 from datetime import date, timedelta
 import math
 import glob
-import xlwt
+from concurrent.futures import ThreadPoolExecutor
 import csv
 
 from datetime import datetime
 from typing import List, Tuple, Optional, Dict
 
+from data_loader import load_investing_data, load_forexfactory_data, load_forexfactory_files, parse_numeric, drop_duplicate_dates
+from automate_fund_correlation import pearson_from_sums
+
 import warnings
 import sys
 if not sys.warnoptions:
@@ -23,9 +26,8 @@ def read_forexfactory_data(path:str, files_name:str) -> pd.DataFrame:
     '''
     The read_forexfactory_data function reads an Excel file containing Forex Factory data located in the given path with the given file name.
     It then extracts the date from the 'History' column and sets it as the index for the DataFrame.
-    It creates a new column called 'Actual [file_name]' and sets the values from the 'Actual' column of the original DataFrame.
-    It drops unnecessary columns like 'History', 'Date', 'Forecast', 'Previous', and 'Actual' columns.
-    Finally, it concatenates the modified DataFrame to an empty DataFrame called 'final_df' and returns the final DataFrame.
+    It returns a DataFrame with a single column called 'Actual [file_name]', holding the values from the 'Actual' column of the file.
+    The Excel file is parsed by load_forexfactory_data, which serves it from a binary cache until the file changes.
 
     Parameters:
     - path (str): The directory path where the Excel file is located.
@@ -35,11 +37,11 @@ def read_forexfactory_data(path:str, files_name:str) -> pd.DataFrame:
     - pd.DataFrame: A DataFrame containing the processed Forex Factory data.
 
     Data Processing Steps:
-    - The function reads the Excel file located at 'path' with the name 'file_name+'.xlsx' into a Pandas DataFrame.
-    - It extracts the 'Date' from the 'History' column and sets it as the index for the DataFrame.
-    - A new column is created, named 'Actual [file_name]', which contains the values from the 'Actual' column of the original DataFrame.
-    - The function then drops unnecessary columns including 'History', 'Date', 'Forecast', 'Previous', and 'Actual'.
-    - The modified DataFrame is concatenated with an empty DataFrame called 'final_df'.
+    - The function loads the Excel file located at 'path' with the name 'file_name+'.xlsx' with load_forexfactory_data,
+      from the cache if the file did not change since it was last parsed.
+    - The 'Date' extracted from the 'History' column is the index of the DataFrame, sorted in ascending order.
+    - The values are converted to float (commas, '%' signs and K/M/B suffixes are handled by parse_numeric).
+    - A new column is created, named 'Actual [file_name]', which contains the values from the 'Actual' column of the file.
     - The final DataFrame containing the processed Forex Factory data is returned.
 
     Example Usage:
@@ -48,41 +50,73 @@ def read_forexfactory_data(path:str, files_name:str) -> pd.DataFrame:
 
     Note: This function simplifies the process of reading and preprocessing Forex Factory data from Excel files for analysis or modeling.
     '''
-    final_df = pd.DataFrame()
-    df = pd.read_excel(path+"/"+files_name+'.xlsx')
-    try:
-        df['Date'] = df['History'].str.split(',').str[1]
-    except: 
-        df['Date'] = df['History']
-    df.index = pd.to_datetime(df["Date"], format=" %Y %b %d")
-    df.sort_index(axis=0, ascending=True, inplace=True)
-    df["Actual"+" "+files_name] = df["Actual"]
-    df = df.drop(columns=["History", "Date", "Forecast", "Previous", "Actual"])
-    final_df = pd.concat([final_df, df], axis=1) 
+    df = load_forexfactory_data(files_name, path=path)
+    final_df = df[["Actual"]].rename(columns={"Actual": "Actual"+" "+files_name})
     
     return final_df      
 
 
-def convert_monthly_to_daily(final_df: pd.DataFrame) -> pd.DataFrame:
+def expand_to_daily(df: pd.DataFrame, freq: str = 'D', include_last: bool = False, keep: str = 'last') -> pd.DataFrame:
+    '''
+    The expand_to_daily function turns an irregular, low frequency DataFrame (monthly releases, weekly data, ...) into a daily
+    or business-day DataFrame, where every day holds the values of the last row dated on or before it (step semantics).
+    All the columns are expanded together by a single reindex with forward filling, instead of one small DataFrame per row and column.
+
+    Parameters:
+    - df (pd.DataFrame): A DataFrame with a DatetimeIndex, in any order.
+    - freq (str, optional): The frequency of the output index, 'D' for calendar days or 'B' for business days. Default is 'D'.
+    - include_last (bool, optional): If True, the date of the last row is part of the output, otherwise the output stops the day before. Default is False.
+    - keep (str, optional): Which row of a duplicated date is used, 'first' or 'last'. Default is 'last'.
+
+    Returns:
+    - pd.DataFrame: A DataFrame with the same columns and a daily DatetimeIndex from the first to the last date of 'df'.
+      It is empty if 'df' has less than two distinct dates and 'include_last' is False.
+
+    Data Processing Steps:
+    - The rows are sorted by date (stable sort) and only one row is kept per date.
+    - The daily index between the first and the last date is built once with 'pd.date_range'.
+    - The rows are forward filled onto the daily index by position, so a missing value in a row stays missing until the next row.
+
+    Example Usage:
+    >>> monthly_data = pd.DataFrame({'Value': [100, 110, 120]}, index=pd.to_datetime(['2022-01-01', '2022-02-01', '2022-03-01']))
+    >>> daily_data = expand_to_daily(monthly_data)
+    >>> print(daily_data.loc['2022-01-30':'2022-02-02'])
+                Value
+    2022-01-30    100
+    2022-01-31    100
+    2022-02-01    110
+    2022-02-02    110
+    '''
+    df = df.sort_index(kind='mergesort')
+    df = df[~df.index.duplicated(keep=keep)]
+    if len(df.index) == 0:
+        return df.copy()
+
+    days = pd.date_range(start=df.index[0], end=df.index[-1], freq=freq)
+    if not include_last:
+        days = days[days < df.index[-1]]
+
+    return df.reindex(days, method='ffill')
+
+
+def convert_monthly_to_daily(final_df: pd.DataFrame, freq: str = 'D') -> pd.DataFrame:
     '''
     The convert_monthly_to_daily function takes a Pandas DataFrame with monthly frequency data and returns the same data with daily frequency.
-    It does so by generating a new DataFrame with daily frequency between each month and converting the monthly data to daily data.
+    Every day between two months takes the value of the earlier month, and the last month is not expanded since its end is unknown.
 
     Parameters:
     - final_df (pd.DataFrame): A Pandas DataFrame with monthly frequency data.
+    - freq (str, optional): 'D' for calendar days or 'B' for business days. Default is 'D'.
 
     Returns:
     - pd.DataFrame: A Pandas DataFrame with daily frequency data.
 
     Data Processing Steps:
-    - The function creates an empty dataframe called 'new_df'.
-    - It then iterates through the index of the input DataFrame 'final_df', which is assumed to be a DatetimeIndex with monthly frequency.
-    - For each month, the function generates daily dates between the current and next month using 'pd.date_range'.
-    - It then iterates through the columns of 'final_df' and creates a new DataFrame 'daily_df' with daily frequency data for each column.
-    - The daily data is generated by repeating the monthly value for each day in the month.
-    - 'daily_df' is then concatenated with 'new_df' to build the daily frequency dataset.
-    - The function continues this process for all months in the input DataFrame.
-    - The resulting 'new_df' contains the same data as the input 'final_df' but with daily frequency.
+    - The input DataFrame 'final_df' is assumed to have a DatetimeIndex with monthly (or any lower than daily) frequency.
+    - All the columns are expanded at once by 'expand_to_daily', with a single reindex and forward fill over the daily dates
+      from the first month up to the day before the last month.
+    - If a month is duplicated, its last row is used.
+    - The resulting DataFrame contains the same columns as the input 'final_df' but with daily frequency.
 
     Example Usage:
     >>> monthly_data = pd.DataFrame({
@@ -96,32 +130,90 @@ def convert_monthly_to_daily(final_df: pd.DataFrame) -> pd.DataFrame:
 
     Note: This function is useful for converting data with monthly frequency to daily frequency, which can be necessary for various time series analysis or modeling tasks.
     '''    
-    new_df = pd.DataFrame()
-    for i in range(len(final_df.index)-1): 
-            indexes = pd.date_range(start = final_df.index[i],end = final_df.index[i+1], freq='D')
-            for n in range(len(final_df.columns)):
-                daily_df = pd.DataFrame({final_df.columns[n]: np.repeat(final_df[final_df.columns[n]][i], len(indexes)-1)}, index=indexes[:-1])
-                new_df = pd.concat([new_df, daily_df]) 
-                
-    return new_df
+    return expand_to_daily(final_df, freq=freq, include_last=False, keep='last')
 
 
-def combine_daily_data(files:list, path:str) -> pd.DataFrame:
+def align_frames(frames: list, how: str = 'left') -> pd.DataFrame:
+    '''
+    The align_frames function puts several time-indexed DataFrames side by side in a single alignment pass.
+    Each frame is reindexed once onto the target index and the columns are concatenated in the order of 'frames',
+    so the cost grows linearly with the total number of rows, instead of re-aligning an ever-growing frame with one join per file.
+
+    Alignment Modes:
+    - 'left': the rows of the first frame, in its order, like first.join(second).join(third) ...
+    - 'nested': the rows of the first frame, like first.join(second.join(third.join(...))), so a value of a frame
+      is kept only on the dates that every frame before it has. This is how combine_investing_data and combine_daily_data align their files.
+    - 'outer': the sorted union of the dates of all frames.
+    Only the first frame of a 'left' or 'nested' alignment may have duplicated dates, the other frames keep the last row of every date (see drop_duplicate_dates).
+    This differs from the chained joins on purpose: a join repeats the matching rows once per duplicate of the joined frame,
+    while here every date of the first frame gets a single value from each other frame, the same one as Panel.load and the compacted CSVs.
+
+    Parameters:
+    - frames (list): A list of DataFrames with a datetime index.
+    - how (str, optional): 'left', 'nested' or 'outer'. Default is 'left'.
+
+    Returns:
+    - pd.DataFrame: A DataFrame with the columns of all frames, aligned on the chosen index.
+
+    Example Usage:
+    >>> a = pd.DataFrame({'A': [1, 2, 3]}, index=pd.date_range('2022-01-01', periods=3))
+    >>> b = pd.DataFrame({'B': [10, 20]}, index=pd.date_range('2022-01-02', periods=2))
+    >>> print(align_frames([a, b]))
+                A     B
+    2022-01-01  1   NaN
+    2022-01-02  2  10.0
+    2022-01-03  3  20.0
+    '''
+    if len(frames) == 0:
+        return pd.DataFrame()
+
+    if how in ('left', 'nested'):
+        index = frames[0].index
+        others = frames[1:]
+        parts = [frames[0].reset_index(drop=True)]
+    elif how == 'outer':
+        index = frames[0].index
+        for df in frames[1:]:
+            index = index.union(df.index)
+        index = index.unique().sort_values()
+        others = frames
+        parts = []
+    else:
+        raise ValueError(f"how must be 'left', 'nested' or 'outer', not {how}")
+
+    # For 'nested', dates missing from a frame are missing for all the frames after it
+    kept_dates = np.ones(len(index), dtype=bool)
+    for df in others:
+        df = drop_duplicate_dates(df)
+        aligned = df.reindex(index).reset_index(drop=True)
+        if how == 'nested':
+            aligned[~kept_dates] = np.nan
+            kept_dates &= index.isin(df.index)
+        parts.append(aligned)
+
+    combined = pd.concat(parts, axis=1)
+    combined.index = index
+    return combined
+
+
+def combine_daily_data(files:list, path:str, workers:int = 1) -> pd.DataFrame:
     '''
     The combine_daily_data function combines daily Forex Factory dataframes into one final dataframe.
     It takes in two parameters: 'files', a list of names of Excel files to read from, and 'path', the directory path where the files are located.
     The function returns a single dataframe that combines all the daily dataframes read from the specified Excel files.
 
     Data Processing Steps:
-    - The function first creates an empty dataframe called 'combined_daily_data'.
-    - It then iterates over each file name in the 'files' list and reads the Forex Factory data from the Excel file using the 'read_forexfactory_data' function.
+    - The function reads the Forex Factory data of every file in the 'files' list with 'load_forexfactory_files', which serves the files
+      from the binary cache and parses the others in 'workers' processes.
     - The function then converts the monthly data to daily data using the 'convert_monthly_to_daily' function.
-    - The resulting daily dataframe is then joined with the 'combined_daily_data' dataframe using the 'join' method.
-    - Finally, the function returns the 'combined_daily_data' dataframe containing the daily Forex Factory data from all the specified Excel files.
+    - All daily dataframes are aligned in one pass by 'align_frames' (how='nested'), which gives the same result as joining
+      every new file onto the previously combined data: the dates of the last file, with the last file's columns first.
+    - Finally, the function returns the combined dataframe containing the daily Forex Factory data from all the specified Excel files.
 
     Parameters:
     - files (list): A list of file names (without extensions) to process.
     - path (str): The path to the directory where the Excel files are located.
+    - workers (int, optional): The number of processes parsing the Excel files that are not cached yet. Default is 1.
 
     Returns:
     - pd.DataFrame: A combined dataframe containing daily Forex Factory data.
@@ -134,11 +226,10 @@ def combine_daily_data(files:list, path:str) -> pd.DataFrame:
 
     Note: This function is useful for consolidating daily Forex Factory data from multiple Excel files into a single dataframe for analysis or modeling.
     '''
-    combined_daily_data = pd.DataFrame()
-    for file in files:
-        my_df = read_forexfactory_data(path=path, files_name=file)
-        new_df = convert_monthly_to_daily(final_df=my_df)
-        combined_daily_data = new_df.join(combined_daily_data)
+    releases = load_forexfactory_files(files, path=path, workers=workers)
+    daily_data = [convert_monthly_to_daily(final_df=releases[file][["Actual"]].rename(columns={"Actual": "Actual"+" "+file}))
+                  for file in files]
+    combined_daily_data = align_frames(daily_data[::-1], how='nested')
         
     return combined_daily_data 
 
@@ -150,12 +241,9 @@ def read_investing_daily_data(path:str, file_name:str) -> pd.DataFrame:
     The function returns a Pandas DataFrame object with the cleaned data.
 
     Data Cleaning Steps:
-    - Reads the CSV file into a Pandas DataFrame object.
-    - Attempts to convert the 'Date' column to a datetime object using different date formats.
-    - Sets the 'Date' column as the index of the DataFrame.
-    - Sorts the DataFrame in ascending order based on the index.
-    - Creates a new column named 'file_name', which contains the 'Price' column values.
-    - Drops unnecessary columns from the DataFrame, such as 'Date', 'Price', 'Open', 'High', 'Low', 'Change %', and 'Vol.'
+    - Loads the cleaned CSV file through 'load_investing_data', which serves it from the binary cache when the CSV is unchanged.
+    - The cleaned frame has the parsed 'Date' column as a sorted index and float price columns.
+    - Keeps only the 'Price' column and renames it to 'file_name'.
 
     Parameters:
     - path (str): The path to the directory containing the CSV file.
@@ -179,23 +267,8 @@ def read_investing_daily_data(path:str, file_name:str) -> pd.DataFrame:
 
     Note: In this example, the function reads daily data from a CSV file and performs data cleaning steps to obtain a Pandas DataFrame with the desired format.
     '''
-    df = pd.read_csv(path+'/'+file_name+'.csv')
-    #df = pd.read_excel(path+'/'+file_name+'.xlsx')
-    try:
-        df.index = pd.to_datetime(df["Date"], format="%b %d, %Y")
-    except:
-        try:
-            df.index = pd.to_datetime(df["Date"], format="%m/%d/%Y") 
-        except:
-            df.index = pd.to_datetime(df["Date"], format="%d/%m/%Y") 
-            
-    df.sort_index(axis=0, ascending=True, inplace=True)
-    df[file_name] = df["Price"]  
-    
-    try:
-        df = df.drop(columns=["Date", "Price", "Open", "High", "Low", "Change %", "Vol."])
-    except:
-        df = df.drop(columns=["Date", "Price", "Open", "High", "Low", "Change %"]) 
+    df = load_investing_data(file_name=file_name, path=path)
+    df = df[["Price"]].rename(columns={"Price": file_name})
         
     return df
 
@@ -222,82 +295,98 @@ def return_files_name(path:str):
     return files
 
 
-def monthly_features(files: list, path='../../data/fund_model/monthly'):
+def monthly_features(files: list, path='../../data/fund_model/monthly', mode: str = 'binary', workers: int = 1):
     """
     For this function we have 2 options:
-    first option: classify features into 6 classes
-    second option: classify features into 2 classes
+    first option: classify features into 6 classes (mode='6-class')
+    second option: classify features into 2 classes (mode='binary')
     Generate monthly features from a list of Excel files.
 
     This function reads Excel files containing financial data, processes them,
-    and extracts specific features for analysis.
+    and extracts specific features for analysis. The files are loaded with load_forexfactory_files, from the binary cache
+    when they did not change, each file is labeled in a single vectorized pass (np.select)
+    and all the files are combined with a single concat at the end.
 
     Parameters:
         files (list): A list of file names (without extensions) to process.
         path (str, optional): The path to the directory where the Excel files are located. Default is '../../data/fund_model/monthly'.
+        mode (str, optional): 'binary' or '6-class'. Default is 'binary'.
+        workers (int, optional): The number of processes parsing the Excel files that are not cached yet. Default is 1.
 
     Returns:
-        pd.DataFrame: A DataFrame containing the processed data with features.
+        pd.DataFrame: A DataFrame containing the processed data with features, the last file of 'files' first.
 
     Features:
-        - The function calculates a binary feature 'Actual_[file_name]' for each file in the 'files' list based on the relationship between 'Actual' and 'Forecast' values.
-          - If 'Actual' is greater than 'Forecast', 'Actual_[file_name]' is set to 1.
-          - If 'Actual' is less than 'Forecast', 'Actual_[file_name]' is set to 0.
+        - mode='binary': the function calculates a feature 'Actual [file_name]' for each file in the 'files' list based on the relationship between 'Actual' and 'Forecast' values.
+          - If 'Actual' is greater than 'Forecast', 'Actual [file_name]' is set to 1.
+          - If 'Actual' is less than 'Forecast', 'Actual [file_name]' is set to 0.
+          - Otherwise (equal or missing values) it is NaN.
+        - mode='6-class': 'Actual' is also compared to 'Previous', the first matching class is used:
+          - 1: 'Actual' is greater than 'Forecast' and 'Previous'.
+          - 2: 'Actual' is less than 'Forecast' and 'Previous'.
+          - 3: 'Actual' is less than 'Forecast' and greater than 'Previous'.
+          - 4: 'Actual' is greater than 'Forecast' and less than 'Previous'.
+          - 5: 'Actual' is equal to 'Forecast' and different from 'Previous'.
+          - 6: any other case.
 
     Example Usage:
         files_to_process = ['file1', 'file2']
         features_df = monthly_features(files_to_process)
+        classes_df = monthly_features(files_to_process, mode='6-class')
 
     """
-    final_df = pd.DataFrame()    
+    if mode not in ('binary', '6-class'):
+        raise ValueError(f"mode must be 'binary' or '6-class', not {mode}")
+
+    releases = load_forexfactory_files(files, path=path, workers=workers)
+    features = []
     for files_name in files:
-        df = pd.read_excel(path+'/'+files_name+'.xlsx')
-        df["Actual"+" "+files_name] = np.nan
-        try:
-            df['Date'] = df['History'].str.split(',').str[1]
-        except:
-            df['Date'] = df['History']
-        df.index = pd.to_datetime(df["Date"], format=" %Y %b %d")
-        df.sort_index(axis=0, ascending=True, inplace=True)
-        
-        for i in range(len(df['Actual'])):
-            # if df['Actual'][i] > df['Forecast'][i] and df['Actual'][i] > df["Previous"][i]:
-            #     df["Actual"+" "+files_name][i] = 1
-            # elif df['Actual'][i] < df['Forecast'][i] and df['Actual'][i] < df["Previous"][i]:    
-            #     df["Actual"+" "+files_name][i] = 2
-            # elif df["Actual"][i] < df["Forecast"][i] and df["Actual"][i] > df["Previous"][i]:
-            #     df["Actual"+" "+files_name][i] = 3
-            # elif df["Actual"][i] > df["Forecast"][i] and df["Actual"][i] < df["Previous"][i]: 
-            #     df["Actual"+" "+files_name][i] = 4
-            # elif df["Actual"][i] == df["Forecast"][i] and df["Actual"][i] != df["Previous"][i]:   
-            #     df["Actual"+" "+files_name][i] = 5
-            # else:
-            #     df["Actual"+" "+files_name][i] = 6
-            if df['Actual'][i] > df['Forecast'][i]:
-                df["Actual"+" "+files_name][i] = 1   
-            elif df['Actual'][i] < df['Forecast'][i]: 
-                df["Actual"+" "+files_name][i] = 0
-        df = df.drop(columns=["History", "Date", "Forecast", "Previous", "Actual"])
+        df = releases[files_name].copy()
+
+        actual, forecast, previous = df['Actual'], df['Forecast'], df['Previous']
+        if mode == 'binary':
+            df["Actual"+" "+files_name] = np.select([actual > forecast, actual < forecast], [1, 0], default=np.nan)
+        else:
+            conditions = [(actual > forecast) & (actual > previous),
+                          (actual < forecast) & (actual < previous),
+                          (actual < forecast) & (actual > previous),
+                          (actual > forecast) & (actual < previous),
+                          (actual == forecast) & (actual != previous)]
+            df["Actual"+" "+files_name] = np.select(conditions, [1, 2, 3, 4, 5], default=6)
+        df = df.drop(columns=["Forecast", "Previous", "Actual"])
         df = df[~df.index.duplicated(keep='first')]
-        final_df = pd.concat([df, final_df], axis=1)
+        features.append(df)
+
+    if len(features) == 0:
+        return pd.DataFrame()
+    final_df = pd.concat(features[::-1], axis=1)
         
     return final_df  
 
 
-def discrete_to_continuous(df: pd.DataFrame) -> pd.DataFrame:
+def discrete_to_continuous(df: pd.DataFrame, method: str = 'step', freq: str = 'D', fill_value=0) -> pd.DataFrame:
     '''
-    The discrete_to_continuous function takes a Pandas DataFrame with discrete time intervals and interpolates it to fill in the gaps,
-    returning a new DataFrame with continuous time intervals. The function works by looping through each row of the input DataFrame,
-    finding the time interval between it and the next row, and then creating a new DataFrame with daily time intervals for that interval.
-    It then uses forward filling to interpolate the values for the new DataFrame, and finally concatenates it with a final DataFrame that combines
-    all the daily time intervals. The input DataFrame must have a datetime index, and the time intervals between rows should be of fixed length.
-    The output DataFrame has a datetime index with continuous time intervals, and any missing values are filled in using forward filling.
+    The discrete_to_continuous function takes a Pandas DataFrame with discrete time intervals and fills in the gaps,
+    returning a new DataFrame with continuous time intervals. The full daily index from the first to the last date is built once,
+    the rows are placed on it and the days in between are filled column-wise with vectorized operations, so time and memory are O(n)
+    in the number of output days. The input DataFrame must have a datetime index, the time intervals between rows can be of any length.
+
+    Filling Methods:
+    - 'step': every day takes the values of the last row dated on or before it (forward filling).
+    - 'linear': the values are interpolated linearly between rows, every output day counting as one step.
+    - 'time': the values are interpolated linearly in time, which only differs from 'linear' when the output days are not equally
+      spaced in time (e.g. freq='B', where a weekend counts as three days).
+    A missing value in a row is not filled by 'step', and is interpolated over by 'linear' and 'time'. The values that are still
+    missing at the end (e.g. before the first value of a column) are replaced by 'fill_value'.
 
     Parameters:
     - df (pd.DataFrame): The input Pandas DataFrame with discrete time intervals.
+    - method (str, optional): 'step', 'linear' or 'time'. Default is 'step'. The interpolation methods need numeric columns.
+    - freq (str, optional): The frequency of the output index, 'D' for calendar days or 'B' for business days. Default is 'D'.
+    - fill_value (optional): The value of the days that cannot be filled, None keeps them missing. Default is 0.
 
     Returns:
-    - pd.DataFrame: A new DataFrame with continuous time intervals and interpolated values.
+    - pd.DataFrame: A new DataFrame with continuous time intervals and filled values.
 
     Example Usage:
     >>> import pandas as pd
@@ -306,10 +395,9 @@ def discrete_to_continuous(df: pd.DataFrame) -> pd.DataFrame:
     ...         'Date': [datetime(2022, 1, 1), datetime(2022, 1, 3), datetime(2022, 1, 5)]}
     >>> df = pd.DataFrame(data)
     >>> df.set_index('Date', inplace=True)
-    >>> continuous_df = discrete_to_continuous(df)
+    >>> continuous_df = discrete_to_continuous(df, method='linear')
     >>> print(continuous_df)
-               Value
-    Date             
+                Value
     2022-01-01   10.0
     2022-01-02   15.0
     2022-01-03   20.0
@@ -317,48 +405,41 @@ def discrete_to_continuous(df: pd.DataFrame) -> pd.DataFrame:
     2022-01-05   30.0
 
     Note: In this example, the function interpolates values for the continuous time intervals between the discrete time intervals in the input DataFrame.
+    With the default method='step', 2022-01-02 would be 10 and 2022-01-04 would be 20.
     '''
-    
-    final_df = pd.DataFrame()
-    for k in range(len(df.index)-1):
-        daily_date=[]
-        start_date = df.index[k]
-        end_date = df.index[k+1]
-        delta = end_date - start_date
-        
-        for i in range(delta.days + 1):
-            day = start_date + timedelta(days=i)
-            daily_date.append( pd.to_datetime(day, format=" %Y %b %d"))
-        new_df = pd.DataFrame({'time':pd.Series(daily_date)})    
-        new_df.index = pd.to_datetime(new_df["time"], format=" %Y %b %d")
-        new_df = new_df.drop(columns=['time'])
-        new_df = pd.concat([new_df, df[k:k+2]], axis=1) 
-        
-        for n in range(len(new_df.columns)):
-            is_cell_nan = pd.isnull(new_df.iloc[0, n])
-            if is_cell_nan == False:
-                new_df[new_df.columns[n]] = new_df[new_df.columns[n]].fillna(method="ffill") 
-        
-        final_df = pd.concat([new_df, final_df])
-        final_df.sort_index(axis=0, ascending=True, inplace=True)
-        final_df = final_df[~final_df.index.duplicated(keep='first')]    
-    final_df = final_df.fillna(0)    
-   
+    if method == 'step':
+        final_df = expand_to_daily(df, freq=freq, include_last=True, keep='first')
+    elif method in ('linear', 'time'):
+        df = df.sort_index(kind='mergesort')
+        df = df[~df.index.duplicated(keep='first')]
+        days = pd.date_range(start=df.index[0], end=df.index[-1], freq=freq) if len(df.index) else df.index
+        # The dates of the rows are kept while interpolating, so a row that is not on the output days (e.g. a weekend with freq='B') still counts
+        final_df = df.reindex(df.index.union(days)).interpolate(method=method, limit_area='inside')
+        final_df = final_df.reindex(days)
+    else:
+        raise ValueError(f"method must be 'step', 'linear' or 'time', not {method}")
+
+    if fill_value is not None:
+        final_df = final_df.fillna(fill_value)
+
     return final_df
 
 
 
-def combine_investing_data(files_name:list, path:str) -> pd.DataFrame:
+def combine_investing_data(files_name:list, path:str, workers:int = 1) -> pd.DataFrame:
     '''
     The combine_investing_data function takes a list of files names and a path to a directory containing investing data files as inputs,
-    and returns a combined pandas DataFrame of the daily investing data. The function first creates an empty pandas DataFrame object
-    called combined_daily_data. It then loops through each file name in the input files_name list and reads in the daily investing data
-    using the read_investing_daily_data function. The resulting DataFrame is then joined with the combined_daily_data DataFrame using the join method.
-    After processing all the files, the final combined_daily_data DataFrame is returned, which contains the combined daily investing data.
+    and returns a combined pandas DataFrame of the daily investing data. The function reads the daily investing data of every file
+    using the read_investing_daily_data function, optionally in parallel. All the resulting DataFrames are then aligned in one pass by align_frames
+    (how='nested'), which gives the same result as joining every new file onto the previously combined data: the dates of the last file,
+    with the last file's column first. The one difference is a date duplicated in any but the last file: it is not repeated,
+    its last row is used (see align_frames).
+    The cost grows linearly with the total number of rows, so combining all the investing files stays fast.
 
     Parameters:
     - files_name (list): A list of file names to be processed and combined.
     - path (str): The path to the directory containing the investing data files.
+    - workers (int, optional): The number of files read at the same time. Default is 1.
 
     Returns:
     - pd.DataFrame: A combined DataFrame containing daily investing data from all the specified files.
@@ -369,10 +450,9 @@ def combine_investing_data(files_name:list, path:str) -> pd.DataFrame:
     >>> combined_data = combine_investing_data(file_names, data_path)
     >>> print(combined_data.head())
     '''
-    combined_daily_data = pd.DataFrame()
-    for file in files_name:
-        df = read_investing_daily_data(path=path, file_name=file)
-        combined_daily_data = df.join(combined_daily_data)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        daily_data = list(executor.map(lambda file: read_investing_daily_data(path=path, file_name=file), files_name))
+    combined_daily_data = align_frames(daily_data[::-1], how='nested')
         
     return combined_daily_data 
 
@@ -381,11 +461,10 @@ def combine_investing_data(files_name:list, path:str) -> pd.DataFrame:
 def convert_str_to_float(df: pd.DataFrame) -> pd.DataFrame:
     '''
     The convert_str_to_float function takes a Pandas DataFrame as input and converts the string data types in each column to float.
-    The function iterates through each column in the DataFrame, and for each column, it iterates through each row.
-    If a particular cell in the DataFrame is of type string, the function removes any commas in the string to convert it to a numeric float value.
-    Finally, the function converts the column to float using the astype method.
+    Each column is converted in a single vectorized pass by 'parse_numeric', which removes commas, trailing '%' signs
+    and expands the K/M/B suffixes of investing.com volumes. Numeric columns are only cast to float.
     The function modifies the input DataFrame in-place, and returns the modified DataFrame as output.
-    Note that the function assumes that each string value in the DataFrame can be converted to a float after removing commas.
+    Note that the function assumes that each string value in the DataFrame can be converted to a float after this cleaning.
     If a value cannot be converted to a float, the function will raise an error.
 
     Parameters:
@@ -411,12 +490,7 @@ def convert_str_to_float(df: pd.DataFrame) -> pd.DataFrame:
     Note: In this example, the function converts the string values in the 'Price' and 'Quantity' columns to float, removing commas in the process.
     '''
     for column in df.columns:
-        for k in range(len(df[column])):
-            if type(df[column][k]) == str:
-                # for i in range(len(df[column])):
-                    # try:
-                df[column][k] = df[column][k].replace(",","")
-        df[column] = df[column].astype(float)      
+        df[column] = parse_numeric(df[column], errors='raise')
 
     return df 
 
@@ -499,14 +573,14 @@ def get_top_abs_correlations(df:pd.DataFrame, n:int) -> pd.Series:
     '''
     The get_top_abs_correlations function takes a Pandas DataFrame and an integer n as input and returns the top n absolute correlations in the DataFrame.
     The function first calculates the correlation matrix for the DataFrame using the corr() method.
-    It then calculates the absolute correlation for each pair of columns using the abs() method and unstack() function.
-    Next, it drops the redundant pairs of correlations using the get_redundant_pairs() function, which returns the diagonal and
-    lower triangular pairs of the correlation matrix. Finally, the function sorts the remaining pairs of correlations in descending
-    order and returns the top n pairs using indexing. The output is a Pandas Series object with the top n pairs of correlations and their corresponding values.
+    It then works directly on the absolute values of the array: the diagonal and lower triangular pairs (the redundant pairs of get_redundant_pairs)
+    are masked out, and the n largest values of the upper triangle are found with a partial selection (np.argpartition), so only these n values are sorted
+    and no Python object is created per pair. The output is a Pandas Series object with the top n pairs of correlations and their corresponding values,
+    indexed by (first column, second column) in the order of the columns. Pairs with a NaN correlation come last.
 
     Parameters:
     - df (pd.DataFrame): The input Pandas DataFrame containing the data.
-    - n (int): The number of top absolute correlations to retrieve.
+    - n (int): The number of top absolute correlations to retrieve, an empty Series is returned when n <= 0.
 
     Returns:
     - pd.Series: A Pandas Series containing the top n pairs of correlations and their corresponding values, sorted in descending order.
@@ -526,11 +600,158 @@ def get_top_abs_correlations(df:pd.DataFrame, n:int) -> pd.Series:
 
     Note: In this example, the function returns the top 2 absolute correlations in the DataFrame.
     '''
-    au_corr = df.corr().abs().unstack()
-    labels_to_drop = get_redundant_pairs(df)
-    au_corr = au_corr.drop(labels=labels_to_drop).sort_values(ascending=False)
-    return au_corr[0:n]
+    corr = df.corr()
+    columns = corr.columns
+    abs_corr = np.abs(corr.to_numpy(dtype=np.float64))
+    n_columns = len(columns)
+    # No pair for n <= 0, every pair for n larger than their number
+    n = max(0, min(n, n_columns * (n_columns - 1) // 2))
+
+    # Flat positions of the upper triangle, NaN and masked pairs rank last
+    upper = (np.arange(n_columns)[:, None] < np.arange(n_columns)[None, :]).ravel()
+    flat = abs_corr.ravel()
+    scores = np.where(upper & ~np.isnan(flat), flat, -np.inf)
+    if n == 0:
+        top = np.empty(0, dtype=np.int64)
+    else:
+        top = np.argpartition(-scores, n - 1)[:n]
+    top = top[np.lexsort((top, -scores[top]))]
+    top = top[scores[top] > -np.inf]
+    if len(top) < n:
+        top = np.concatenate([top, np.flatnonzero(upper & np.isnan(flat))[:n - len(top)]])
+
+    rows, cols = np.divmod(top, n_columns)
+    index = pd.MultiIndex.from_arrays([columns[rows], columns[cols]])
+    return pd.Series(flat[top], index=index)
+
+
+
+def corr_with_target(df:pd.DataFrame, target:str) -> pd.Series:
+    '''
+    The corr_with_target function calculates the Pearson correlation of one target column with every numeric column of the DataFrame,
+    the same values as df.corr()[target] without computing the correlations between all the other columns.
+    The target is centered once, and the sums needed for every column (over the rows where both the column and the target have a value)
+    are computed with a few matrix-vector products and turned into correlations by pearson_from_sums, so the cost is O(columns x rows) instead of O(columns^2 x rows).
 
+    Parameters:
+    - df (pd.DataFrame): The input Pandas DataFrame containing the data, non numeric columns are ignored like in df.corr().
+    - target (str): The name of the target column.
+
+    Returns:
+    - pd.Series: The correlation of every numeric column with the target (1 for the target itself), indexed by column name.
+      NaN for the columns sharing less than 2 rows with the target or that are constant on them.
+
+    Example Usage:
+    >>> import pandas as pd
+    >>> data = {'A': [1, 2, 3, 4, 5],
+    ...         'B': [0.1, 0.2, 0.3, 0.4, 0.5],
+    ...         'C': [0.5, 0.4, 0.3, 0.1, 0.2]}
+    >>> df = pd.DataFrame(data)
+    >>> print(corr_with_target(df, 'A'))
+    A    1.0
+    B    1.0
+    C   -0.9
+    Name: A, dtype: float64
+    '''
+    numeric_df = df.select_dtypes(include=[np.number, bool])
+    values = numeric_df.to_numpy(dtype=np.float64)
+    y = numeric_df[target].to_numpy(dtype=np.float64)
+    if y.ndim != 1:
+        raise ValueError(f"target {target} is not a single column")
+
+    valid = ~np.isnan(values)
+    y_valid = ~np.isnan(y)
+    mask = (valid & y_valid[:, None]).astype(np.float64)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        x = np.where(valid, values - np.nanmean(values, axis=0), 0.0)
+        y = np.where(y_valid, y - np.nanmean(y), 0.0)
+
+    n = mask.sum(axis=0)
+    sum_x = (x * mask).sum(axis=0)
+    sum_xx = (x * x * mask).sum(axis=0)
+    sum_y = y @ mask
+    sum_yy = (y * y) @ mask
+    sum_xy = x.T @ y
+    corr = pearson_from_sums(n, sum_x, sum_y, sum_xx, sum_yy, sum_xy)
+    return pd.Series(corr, index=numeric_df.columns, name=target)
+
+
+def lagged_correlation(df:pd.DataFrame, target:str, lags:int, chunk_size:int = 64) -> pd.DataFrame:
+    '''
+    The lagged_correlation function calculates the Pearson correlation of every numeric column of the DataFrame with the target column
+    shifted by 0, 1, ..., lags rows (the value of the column at row t against the value of the target at row t+lag, like df[target].shift(-lag)),
+    for all the lags at once.
+    For every lag, the correlation only uses the rows where both values exist, like df.corr(). The number of such rows and the sums of x, y, x^2, y^2
+    and xy over them are cross-correlations of the masked columns with the masked target, computed for all the lags with FFTs.
+    The cost is O(columns x rows x log(rows)) whatever the number of lags, instead of one full correlation per lag.
+    The columns are standardized before the FFTs, which keeps the sums accurate, and the sums are turned into correlations by pearson_from_sums.
+
+    Parameters:
+    - df (pd.DataFrame): The input Pandas DataFrame containing the features and the target, non numeric columns are ignored.
+    - target (str): The name of the target column.
+    - lags (int): The largest lag, the correlations are calculated for the lags 0 to lags.
+    - chunk_size (int, optional): The number of columns transformed at the same time, which bounds the memory used. Default is 64.
+
+    Returns:
+    - pd.DataFrame: A tidy DataFrame with the 'feature', 'lag' and 'corr' columns, one row per feature and lag, ordered by lag then by feature.
+      The correlation is NaN when there are less than 2 rows with both values, or when one of the series is constant on them.
+
+    Example Usage:
+    >>> import pandas as pd
+    >>> data = {'A': [1, 2, 3, 4, 5, 6],
+    ...         'B': [1, 3, 2, 5, 4, 6],
+    ...         'target': [0, 1, 2, 3, 4, 5]}
+    >>> df = pd.DataFrame(data)
+    >>> print(lagged_correlation(df, 'target', lags=1))
+      feature  lag      corr
+    0       A    0  1.000000
+    1       B    0  0.885714
+    2       A    1  1.000000
+    3       B    1  0.800000
+    '''
+    numeric_df = df.select_dtypes(include=[np.number, bool])
+    y = numeric_df[target].to_numpy(dtype=np.float64)
+    if y.ndim != 1:
+        raise ValueError(f"target {target} is not a single column")
+    features = numeric_df.drop(columns=target)
+    values = features.to_numpy(dtype=np.float64)
+    rows, columns = values.shape
+    lags = max(int(lags), 0)
+    # Lags of rows or more have no pair, they stay NaN
+    computed = min(lags, max(rows - 1, 0))
+    sums = np.zeros((6, lags + 1, columns))
+
+    def standardize(a):
+        valid = ~np.isnan(a)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            a = a - np.nanmean(a, axis=0)
+            scale = np.nanstd(a, axis=0)
+        a = np.where(valid, a / np.where(scale > 0, scale, 1.0), 0.0)
+        return a, valid.astype(np.float64)
+
+    if rows and columns:
+        # Zero padding to rows + computed avoids the wrap around of the circular correlation
+        size = 1 << (rows + computed - 1).bit_length()
+        y, y_mask = standardize(y)
+        y_hats = [np.fft.rfft(a, size)[:, None] for a in (y_mask, y_mask * y, y_mask * y * y)]
+        for start in range(0, columns, chunk_size):
+            x, x_mask = standardize(values[:, start:start + chunk_size])
+            x_hats = [np.conj(np.fft.rfft(a, size, axis=0)) for a in (x_mask, x, x * x)]
+            # sum over t of a[t] * b[t + lag] for every lag: irfft(conj(rfft(a)) * rfft(b))
+            products = [x_hats[0] * y_hats[0], x_hats[1] * y_hats[0], x_hats[0] * y_hats[1],
+                        x_hats[2] * y_hats[0], x_hats[0] * y_hats[2], x_hats[1] * y_hats[1]]
+            for k, product in enumerate(products):
+                sums[k, :computed + 1, start:start + chunk_size] = np.fft.irfft(product, size, axis=0)[:computed + 1]
+
+    n, sum_x, sum_y, sum_xx, sum_yy, sum_xy = sums
+    # The FFTs leave a rounding noise, a variance below it is a constant series
+    corr = pearson_from_sums(np.rint(n), sum_x, sum_y, sum_xx, sum_yy, sum_xy, tolerance=1e-9)
+
+    return pd.DataFrame({'feature': np.tile(features.columns.to_numpy(), lags + 1),
+                         'lag': np.repeat(np.arange(lags + 1), columns),
+                         'corr': corr.ravel()})
 
 
 def get_top_corr_with_gold(df:pd.DataFrame, target_file_name=str) -> pd.DataFrame:
@@ -541,6 +762,7 @@ def get_top_corr_with_gold(df:pd.DataFrame, target_file_name=str) -> pd.DataFram
     and if it fails, it tries to obtain the correlation between the target_file_name and features labeled with the target_file_name appended with _labeled.
     It then sorts the correlation values in descending order and stores them in a new dataframe along with the name of the corresponding feature.
     The first row is dropped since it corresponds to the target_file_name's correlation with itself. The resulting dataframe is then returned.
+    Only the correlations with the target are computed, by corr_with_target, instead of the full correlation matrix.
 
     Parameters:
     - df (pd.DataFrame): The input Pandas DataFrame containing the data.
@@ -566,9 +788,9 @@ def get_top_corr_with_gold(df:pd.DataFrame, target_file_name=str) -> pd.DataFram
     Note: In this example, the target_file_name is 'A', and the function returns a DataFrame containing the correlation values between 'A' and other features.
     '''
     try:
-        au_corr = df.corr()[target_file_name].abs()
-    except:
-        au_corr = df.corr()[target_file_name+'_labeled'].abs()
+        au_corr = corr_with_target(df, target_file_name).abs()
+    except KeyError:
+        au_corr = corr_with_target(df, target_file_name+'_labeled').abs()
         
     au_corr = au_corr.sort_values(ascending=False)
     df = pd.DataFrame(au_corr)
@@ -725,12 +947,10 @@ def labeling_target(path:str, files_name:list) -> pd.DataFrame:
     '''
     This function takes a file path and a list of file names as input parameters.
     The function reads each file from the path and performs the following operations on each file:
-    1) Replaces the percentage sign (%) in the 'Change %' column with an empty string and converts the values to float data type.
+    1) Loads the cleaned file through 'load_investing_data', so 'Change %' is already a float column and the parsed dates are the sorted index.
     2) Labels each row in the 'Change %' column as 1 if the value is greater than or equal to 0, else labels it as 0.
-    3) Converts the 'Date' column to a datetime data type using one of the specified date formats and sets it as the index of the DataFrame.
-    4) Sorts the DataFrame in ascending order based on the index.
-    5) Adds a new column with a name of the file name appended with '_labeled' to the DataFrame, which contains the labeled 'Change %' values.
-    6) Drops unnecessary columns from the DataFrame.
+    3) Adds a new column with a name of the file name appended with '_labeled' to the DataFrame, which contains the labeled 'Change %' values.
+    4) Drops unnecessary columns from the DataFrame.
     The function returns the final updated DataFrame.
 
     Parameters:
@@ -754,31 +974,9 @@ def labeling_target(path:str, files_name:list) -> pd.DataFrame:
     2022-01-05 00:00:00             1             1             1
     '''
     for file_name in files_name:
-        df = pd.read_csv(path+'/'+file_name+'.csv')
-    
-        for i in range(len(df['Change %'])):
-            df['Change %'][i] = float(df['Change %'][i].replace('%', ''))
-            if df['Change %'][i] >= 0:
-                df['Change %'][i] = 1
-            else:
-                df['Change %'][i] = 0
-
-
-        try:
-            df.index = pd.to_datetime(df["Date"], format="%b %d, %Y")
-        except:
-            try:
-                df.index = pd.to_datetime(df["Date"], format="%m/%d/%Y") 
-            except:
-                df.index = pd.to_datetime(df["Date"], format="%d/%m/%Y") 
-
-        df.sort_index(axis=0, ascending=True, inplace=True)
-        df[file_name+'_labeled'] = df["Change %"]  
-
-        try:
-            df = df.drop(columns=["Date", "Price", "Open", "High", "Low", "Change %", "Vol."])
-        except:
-            df = df.drop(columns=["Date", "Price", "Open", "High", "Low", "Change %"]) 
+        df = load_investing_data(file_name=file_name, path=path)
+        df[file_name+'_labeled'] = np.where(df["Change %"] >= 0, 1, 0)
+        df = df[[file_name+'_labeled']]
     
     return df       
 
@@ -846,24 +1044,62 @@ def create_folder(path:str, folder_name:str):
         print ("Successfully created the directory %s" % folder_path)
 
 
+def aggregate_by_period(frames: Dict[str, pd.DataFrame], freq: str = 'M', how: str = 'sum', prefix: str = 'total_') -> pd.DataFrame:
+    '''
+    Aggregate the values of many named DataFrames per period (month by default) in one pass each.
+
+    The values of all the columns of a frame are first summed row by row (missing values count as 0),
+    then the row totals are aggregated per period with a single resample, instead of masking the whole frame once per period.
+    Every frame gives one column, '[prefix][name]', and the columns are aligned on the union of their periods.
+
+    Parameters:
+        frames (dict): {name: DataFrame with a datetime index}. A frame covers the periods that end between its first and its last date,
+                       the periods of this range without any row are 0 (for how='sum').
+        freq (str, optional): The pandas frequency of the periods, labeled by their end ('M' for months, 'Q', 'A', 'W', ...). Default is 'M'.
+        how (str, optional): How the row totals of a period are aggregated: 'sum', 'mean', 'count', 'max', 'min', ... Default is 'sum'.
+        prefix (str, optional): The prefix of the column names. Default is 'total_'.
+
+    Returns:
+        pd.DataFrame: A DataFrame with a datetime index (one row per period end) and one column per frame,
+                      NaN for the periods a frame does not cover.
+
+    Example Usage:
+        # Monthly totals of the depression indicators of several countries at once
+        totals = aggregate_by_period({'USD': usd_depression, 'EUR': eur_depression}, prefix='total_depression_')
+
+        # Quarterly averages
+        quarterly = aggregate_by_period({'CPI': cpi}, freq='Q', how='mean')
+    '''
+    columns = []
+    for name, df in frames.items():
+        if len(df.index) == 0:
+            continue
+        row_totals = df.sum(axis=1)
+        totals = row_totals.resample(freq).agg(how)
+        # Like pd.date_range(first, last, freq), only keep the periods that end within the dates of the frame
+        totals = totals[(totals.index >= df.index[0]) & (totals.index <= df.index[-1])]
+        columns.append(totals.astype(float).rename(prefix+name))
+
+    if len(columns) == 0:
+        return pd.DataFrame()
+    aggregated = pd.concat(columns, axis=1)
+    aggregated.index.name = None
+    return aggregated
+
+
 def count_depression_value(df:pd.DataFrame, name:str):
     '''
     Calculate the total depression value for each month in the provided DataFrame.
-    In the code above, we first create an empty DataFrame monthly_totals with
-    a monthly frequency datetime index that spans the entire range of the original DataFrame.
-
-    We then loop through each month in the monthly_totals index and use a boolean mask
-    to select the rows in the original DataFrame with the same year and month as
-    the current loop iteration. We sum the values for each column in these selected
-    rows using the sum method, and sum the resulting values across all columns
-    using the sum method again. We then add the resulting total value as a new row to
-    the monthly_totals DataFrame, with the index set to the current month.
-
-    At the end of the loop, the monthly_totals DataFrame will have one column named 'total' containing
-    the sum of all column values for each month in the original DataFrame, and a datetime index with one 
-    row for each month. If any months have no data (i.e. missing values), we drop these rows from the 
-    DataFrame using the dropna method with inplace=True.
-    
+    The values of all the columns are summed for every month by aggregate_by_period, in a single resample over the rows.
+
+    The result has one column named 'total_depression_[name]' containing the sum of all column values for each month
+    in the original DataFrame, and a datetime index with one row (the month end) for each month between the first and the last date.
+    Months without any data have a total of 0.
+
+    Parameters:
+        df (pd.DataFrame): The input DataFrame containing depression data with a datetime index.
+        name (str): A name or label to be appended to the 'total_depression_' column in the result.
+
     Returns:
         pd.DataFrame: A DataFrame with a datetime index containing the total depression values for each month.
 
@@ -873,40 +1109,22 @@ def count_depression_value(df:pd.DataFrame, name:str):
         
         # Calculate total depression values with a custom name
         total_depression = count_depression_value(depression_data, 'CPI')   
-    
+
+        # For many countries at once, use aggregate_by_period directly
+        totals = aggregate_by_period({'USD': usd_data, 'EUR': eur_data}, prefix='total_depression_')
     '''
-    monthly_totals = pd.DataFrame(index=pd.date_range(start=df.index[0], end=df.index[-1], freq='M'))
-    # Loop through each month and sum values for each column
-    for month in monthly_totals.index:
-        mask = (df.index.year == month.year) & (df.index.month == month.month)
-        monthly_totals.loc[month, 'total_depression_'+name] = df.loc[mask, :].sum().sum()
-    # Drop any rows with missing values (i.e. months with no data)
-    monthly_totals.dropna(inplace=True)    
-    return monthly_totals
+    return aggregate_by_period({name: df}, freq='M', how='sum', prefix='total_depression_')
 
 
 def count_inflation_value(df:pd.DataFrame, name:str):
     '''
     Calculate the total inflation value for each month in the provided DataFrame.
-    In the code above, we first create an empty DataFrame monthly_totals with
-    a monthly frequency datetime index that spans the entire range of the original DataFrame.
-
-    We then loop through each month in the monthly_totals index and use a boolean mask
-    to select the rows in the original DataFrame with the same year and month as
-    the current loop iteration. We sum the values for each column in these selected
-    rows using the sum method, and sum the resulting values across all columns
-    using the sum method again. We then add the resulting total value as a new row to
-    the monthly_totals DataFrame, with the index set to the current month.
-
-    At the end of the loop, the monthly_totals DataFrame will have one column named 'total' containing
-    the sum of all column values for each month in the original DataFrame, and a datetime index with one 
-    row for each month. If any months have no data (i.e. missing values), we drop these rows from the 
-    DataFrame using the dropna method with inplace=True.
-    
+    The values of all the columns are summed for every month by aggregate_by_period, in a single resample over the rows.
 
     This function calculates the total inflation value for each month in the provided DataFrame and returns a new DataFrame
     with a datetime index containing the monthly totals. It sums all column values for each month, creating a 'total_inflation_[name]'
-    column in the result.
+    column in the result. There is one row (the month end) for each month between the first and the last date,
+    months without any data have a total of 0.
 
     Parameters:
         df (pd.DataFrame): The input DataFrame containing inflation data with a datetime index.
@@ -922,14 +1140,7 @@ def count_inflation_value(df:pd.DataFrame, name:str):
         # Calculate total inflation values with a custom name
         total_inflation = count_inflation_value(inflation_data, 'CPI')    
     '''    
-    monthly_totals = pd.DataFrame(index=pd.date_range(start=df.index[0], end=df.index[-1], freq='M'))
-    # Loop through each month and sum values for each column
-    for month in monthly_totals.index:
-        mask = (df.index.year == month.year) & (df.index.month == month.month)
-        monthly_totals.loc[month, 'total_inflation_'+name] = df.loc[mask, :].sum().sum()
-    # Drop any rows with missing values (i.e. months with no data)
-    monthly_totals.dropna(inplace=True)    
-    return monthly_totals
+    return aggregate_by_period({name: df}, freq='M', how='sum', prefix='total_inflation_')
 
 
 def count_monthly_price_change(df):
@@ -974,12 +1185,98 @@ def count_monthly_price_change(df):
     return monthly_df
 
 
+def contingency_table(outcome, indicators: Dict[str, pd.Series]) -> pd.DataFrame:
+    """
+    Count the outcomes (e.g. the monthly price changes, 0 or 1) for every state of many indicator series, in one vectorized pass.
+
+    Every indicator is aligned with its outcome series on their dates, the dates where either is missing are skipped.
+    The states of all the indicators are encoded as integers, combined with the encoded outcomes and counted
+    with a single np.bincount, so N indicators cost one pass over their values instead of one groupby and two row-wise applies each.
+
+    Parameters:
+        outcome (pd.Series or dict): The outcome series shared by all the indicators, or {indicator name: outcome series}.
+        indicators (dict): {indicator name: Series of states with a datetime index}.
+
+    Returns:
+        pd.DataFrame: One row per (indicator, state) with the columns 'count_[outcome]' and 'percent_[outcome]' for every outcome value,
+                      the percentages being taken over the row. Only the states that occur are listed.
+
+    Example Usage:
+        # Price changes of EUR/USD against the depression totals of several countries
+        table = contingency_table(price_change_df['price_change'],
+                                  {'EUR': eur_totals['total_depression_EUR'], 'USD': usd_totals['total_depression_USD']})
+
+        # All the country pairs at once
+        table = contingency_table(price_change_df['price_change'], compare_pairs(totals, index=price_change_df.index))
+    """
+    names = list(indicators)
+    outcomes = outcome if isinstance(outcome, dict) else {name: outcome for name in names}
+
+    states_list, outcomes_list = [], []
+    for name in names:
+        df = pd.concat([indicators[name].rename('state'), outcomes[name].rename('outcome')], axis=1).dropna()
+        states_list.append(df['state'].to_numpy())
+        outcomes_list.append(df['outcome'].to_numpy())
+
+    outcome_values, outcome_codes = np.unique(np.concatenate(outcomes_list) if names else np.array([]), return_inverse=True)
+    state_values, state_codes, offset = [], [], 0
+    for states in states_list:
+        values, codes = np.unique(states, return_inverse=True)
+        state_values.append(values)
+        state_codes.append(codes + offset)
+        offset += len(values)
+
+    n_outcomes = len(outcome_values)
+    counts = np.bincount(np.concatenate(state_codes) * n_outcomes + outcome_codes if names else np.array([], dtype=int),
+                         minlength=offset * n_outcomes).reshape(offset, n_outcomes)
+
+    labels = [str(int(value)) if float(value).is_integer() else str(value) for value in outcome_values]
+    index = pd.MultiIndex.from_arrays([np.repeat(names, [len(values) for values in state_values]),
+                                       np.concatenate(state_values) if names else np.array([])], names=['indicator', 'state'])
+    result_df = pd.DataFrame(counts, index=index, columns=['count_'+label for label in labels])
+    totals = counts.sum(axis=1, keepdims=True)
+    for n, label in enumerate(labels):
+        result_df['percent_'+label] = counts[:, n] / totals[:, 0] * 100
+    return result_df
+
+
+def compare_pairs(frames: Dict[str, pd.Series], index: pd.Index = None) -> Dict[str, pd.Series]:
+    """
+    Build the comparison indicator of every pair of series, for contingency_table.
+
+    For each pair (first, second) of 'frames', in their order, the indicator '[first] vs [second]' is 1 where the first value
+    is greater than or equal to the second and 0 otherwise (also when a value is missing), like compare_depression_of_2countries.
+    The indicators are computed on the union of the dates of the pair and of 'index'.
+
+    Parameters:
+        frames (dict): {name: Series} e.g. the 'total_depression_[name]' columns of count_depression_value, one per country.
+        index (pd.Index, optional): Extra dates to compare on, usually the dates of the price changes. Default is None.
+
+    Returns:
+        dict: {'[first] vs [second]': Series of 0/1}.
+
+    Example Usage:
+        pairs = compare_pairs({'EUR': eur_totals.iloc[:, 0], 'USD': usd_totals.iloc[:, 0], 'JPY': jpy_totals.iloc[:, 0]})
+    """
+    names = list(frames)
+    pairs = dict()
+    for a in range(len(names)):
+        for b in range(a + 1, len(names)):
+            dates = frames[names[a]].index.union(frames[names[b]].index)
+            if index is not None:
+                dates = dates.union(index)
+            first, second = frames[names[a]].reindex(dates), frames[names[b]].reindex(dates)
+            pairs[names[a]+' vs '+names[b]] = pd.Series(np.where(first >= second, 1.0, 0.0), index=dates)
+    return pairs
+
+
 def compare_depression_with_price_change(df_depression_value, df_price_change, path, file_name):
     """
     Compare depression values with monthly price changes and generate a summary CSV file.
 
     This function takes two DataFrames, one containing depression values and another containing monthly price changes.
     It compares the two datasets and generates a summary DataFrame, along with saving it as a CSV file.
+    The counts and percentages are computed by contingency_table.
 
     Parameters:
         df_depression_value (pd.DataFrame): A DataFrame containing depression values with a 'total' column.
@@ -1001,12 +1298,9 @@ def compare_depression_with_price_change(df_depression_value, df_price_change, p
 
     """    
     df = pd.concat([df_depression_value, df_price_change], axis=1)    
-    # group the dataframe by the values in column2, and count the occurrences of 0 and 1 in column1
-    result_df = df.groupby('total')['price_change'].value_counts().unstack(fill_value=0)    
-    # rename the columns to indicate whether the count is for 0 or 1
-    result_df.columns = ['count_0', 'count_1']
-    result_df['percent_0'] = result_df.apply(lambda x: x['count_0'] / (x['count_0'] + x['count_1']) * 100, axis=1)
-    result_df['percent_1'] = result_df.apply(lambda x: x['count_1'] / (x['count_0'] + x['count_1']) * 100, axis=1)
+    # count the occurrences of 0 and 1 in 'price_change' for every value of 'total'
+    result_df = contingency_table(df['price_change'], {'total': df['total']}).loc['total']
+    result_df.index.name = 'total'
 
     result_df = result_df.reset_index()
     result_df.to_csv(path+'/'+file_name+'.csv')
@@ -1021,6 +1315,8 @@ def compare_depression_of_2countries(df1:pd.DataFrame, df2:pd.DataFrame, df_pric
     for example, df1 is counted depression rate for EUR and df2 is counted depression rate for USD. If the df1 value is larger than
     the df2 value, the EUR currency should get stronger, so the EUR/USD pair should be bought. Also, if the df2 value is greater than 
     EUR value, the EUR should get weaker, so the EUR/USD pair shoud be sold.
+    The comparison is computed for all the months at once, and the counts and percentages by contingency_table.
+    To compare all the pairs of many countries in one table, use contingency_table with compare_pairs.
    
 
     Parameters:
@@ -1047,17 +1343,10 @@ def compare_depression_of_2countries(df1:pd.DataFrame, df2:pd.DataFrame, df_pric
         result_summary = compare_depression_of_2countries(eur_depression_df, usd_depression_df, price_change_df, 'results/', 'depression_comparison')    
     '''
     df = pd.concat([df1, df2, df_price_change], axis=1)
-    df['compare_depression'] = np.nan
-    for i in range(len(df[df.columns[0]])):
-        if df[df.columns[0]][i] >= df[df.columns[1]][i]:
-            df['compare_depression'][i] = 1
-        else:
-            df['compare_depression'][i] = 0
+    df['compare_depression'] = np.where(df[df.columns[0]] >= df[df.columns[1]], 1.0, 0.0)
             
-    result_df = df.groupby('compare_depression')['price_change'].value_counts().unstack(fill_value=0)    
-    result_df.columns = ['count_0', 'count_1']
-    result_df['percent_0'] = result_df.apply(lambda x: x['count_0'] / (x['count_0'] + x['count_1']) * 100, axis=1)
-    result_df['percent_1'] = result_df.apply(lambda x: x['count_1'] / (x['count_0'] + x['count_1']) * 100, axis=1)   
+    result_df = contingency_table(df['price_change'], {'compare_depression': df['compare_depression']}).loc['compare_depression']
+    result_df.index.name = 'compare_depression'
     result_df.to_csv(path+'/'+file_name+'.csv')
     return result_df       
         
@@ -1076,6 +1365,9 @@ def merge_csv(files_list, saved_file_name='output.xls'):
     Returns:
         None
 
+    Note:
+        xlwt is imported on the first call, it is only needed for the Excel export.
+
     Example Usage:
         # List of directories containing CSV files
         directories = ['data_set_1', 'data_set_2']
@@ -1083,6 +1375,8 @@ def merge_csv(files_list, saved_file_name='output.xls'):
         # Merge CSV files and save the result as 'merged_output.xls'
         merge_csv(directories, 'merged_output.xls')
     """    
+    import xlwt
+
     create_folder(path=os.getcwd()+'/feature_analysis/', folder_name='merged_files')
     for file in files_list:
         path = os.getcwd()+'/feature_analysis/'+file+'/'
@@ -1108,12 +1402,85 @@ def merge_csv(files_list, saved_file_name='output.xls'):
     wb.save(saved_file_name)   
     
     
+def event_study(news: Dict[str, pd.Series], prices: pd.DataFrame, periods: int = 5) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Measure how many assets move after the releases of many news series, for all horizons at once.
+
+    For every release, the move of an asset over period p is the change of its price from the last bar before the release date
+    to the bar p bars after the release (p = 0 is the bar of the release day itself for a daily series),
+    and its label is 1 if the move is positive, 0 otherwise. The bar before every release is found with np.searchsorted
+    and the prices of all the horizons and assets are read from a strided (sliding window) view of the price array,
+    so the cost is a few array operations per news series whatever the number of releases, periods and assets.
+
+    Parameters:
+        news (dict): {news name: Series of release values indexed by release date}. A single Series is also accepted.
+        prices (pd.DataFrame): Prices of the assets, one column per asset, with a sorted DatetimeIndex without duplicates.
+        periods (int, optional): The last period analyzed after each release. Default is 5.
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]:
+        - events: one row per (news, Date) release with the 'News' value, the labels '[asset]_period_[p]' and the moves
+          '[asset]_move_[p]' for p = 0 ... periods. Horizons that are not covered by the prices are NaN.
+        - summary: one row per (news, asset, period) with the number of covered releases ('count'), the 'mean' and 'median' moves
+          and the share of positive moves ('up_ratio').
+
+    Example Usage:
+        # Effect of two news series on gold and the dollar index over 10 days
+        events, summary = event_study({'CPI m/m': cpi['Actual'], 'Trade Balance': trade['Actual']},
+                                      prices[['Gold', 'US Dollar Index']], periods=10)
+        print(summary.loc['CPI m/m'])
+    """
+    if isinstance(news, pd.Series):
+        news = {news.name: news}
+
+    assets = list(prices.columns)
+    values = prices.to_numpy(dtype=np.float64)
+    n_bars = len(values)
+    # Pad with NaN bars so that every window has the same length, then view (bar, asset, window) without copying
+    padded = np.vstack([values, np.full((periods + 1, len(assets)), np.nan)])
+    windows = np.lib.stride_tricks.sliding_window_view(padded, periods + 2, axis=0)[:n_bars]
+
+    events_list, summary_list = [], []
+    for news_name, releases in news.items():
+        dates = pd.DatetimeIndex(releases.index)
+        base = np.searchsorted(prices.index.values, dates.values, side='left') - 1
+        covered = (base >= 0)[:, None] & (base[:, None] + 1 + np.arange(periods + 1) < n_bars)
+
+        window = windows[np.clip(base, 0, None)]                                # (event, asset, periods + 2)
+        moves = window[:, :, 1:] - window[:, :, :1]                             # (event, asset, periods + 1)
+        moves = np.where(covered[:, None, :], moves, np.nan)
+        labels = np.where(covered[:, None, :], (moves > 0).astype(np.float64), np.nan)
+
+        columns = {'News': releases.to_numpy()}
+        for a, asset in enumerate(assets):
+            for p in range(periods + 1):
+                columns[str(asset)+'_period_'+str(p)] = labels[:, a, p]
+        for a, asset in enumerate(assets):
+            for p in range(periods + 1):
+                columns[str(asset)+'_move_'+str(p)] = moves[:, a, p]
+        events_list.append(pd.DataFrame(columns, index=pd.MultiIndex.from_arrays([[news_name] * len(dates), dates], names=['news', 'Date'])))
+
+        finite = ~np.isnan(moves)
+        count = finite.sum(axis=0)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            mean = np.nanmean(moves, axis=0)
+            median = np.nanmedian(moves, axis=0)
+        up_ratio = np.where(count > 0, (moves > 0).sum(axis=0) / np.maximum(count, 1), np.nan)
+        index = pd.MultiIndex.from_product([[news_name], assets, range(periods + 1)], names=['news', 'asset', 'period'])
+        summary_list.append(pd.DataFrame({'count': count.ravel(), 'mean': mean.ravel(), 'median': median.ravel(),
+                                          'up_ratio': up_ratio.ravel()}, index=index))
+
+    return pd.concat(events_list), pd.concat(summary_list)
+
+
 def news_effect_with_periods(affected_feature_path='../../data/fund_model/energy', affected_feature_file_name='XAU_USD', monthly_news_path='../../data/fund_model/monthly/', monthly_news_file_name= 'Trade Balance', periods=5):
     """
     Analyze the effect of monthly news on a specific feature over multiple periods.
 
     This function analyzes the effect of monthly news on a selected financial feature over a specified number of periods.
     It calculates the change in the feature's value over each period after the news release and whether it is positive (1) or not (0).
+    The feature is expanded to calendar days, and the changes of all the releases and periods are computed at once by event_study.
 
     Parameters:
         affected_feature_path (str, optional): The path to the directory containing the affected financial feature data.
@@ -1128,6 +1495,7 @@ def news_effect_with_periods(affected_feature_path='../../data/fund_model/energy
 
     Returns:
         pd.DataFrame: A DataFrame containing the effect of monthly news on the specified feature over multiple periods.
+                      Period p compares the day before the release with p days after it, and is NaN when these days are not in the data.
 
     Example Usage:
         # Analyze the effect of 'Trade Balance' news on 'XAU_USD' over 3 periods
@@ -1142,25 +1510,13 @@ def news_effect_with_periods(affected_feature_path='../../data/fund_model/energy
     #monthly_news_df = read_forexfactory_data(path=monthly_news_path, files_name=monthly_news_file_name)
     monthly_news_df = monthly_features(files=[monthly_news_file_name], path=monthly_news_path)
     
-    column_name_list = ['News_'+monthly_news_file_name]
-    for i in range(0, periods+1):
-        column_name_list.extend([affected_feature_file_name+'_period_'+str(i)])
+    events, _ = event_study({monthly_news_file_name: monthly_news_df[monthly_news_df.columns[0]]},
+                            affected_feature_df[[affected_feature_df.columns[0]]].rename(columns={affected_feature_df.columns[0]: affected_feature_file_name}),
+                            periods=periods)
     
-    new_df = pd.DataFrame(columns=column_name_list)
-    for i in range(len(monthly_news_df.index)):
-        new_df = new_df.append({'News_'+monthly_news_file_name: monthly_news_df[monthly_news_df.columns[0]].loc[monthly_news_df.index[i]]}, ignore_index=True)
-        for n in range(2, periods+3):
-            indexes = pd.date_range(start = monthly_news_df.index[i], periods=n) + timedelta(days=-1)
-            #print(indexes)
-            try:    
-                selected_rows = affected_feature_df.loc[indexes[0:n]]
-                result = selected_rows[affected_feature_df.columns[0]].iloc[-1] - selected_rows[affected_feature_df.columns[0]].iloc[0]
-                if result > 0:        
-                    new_df.at[i, affected_feature_file_name+'_period_'+str(n-2)] = 1
-                else:
-                    new_df.at[i, affected_feature_file_name+'_period_'+str(n-2)] = 0
-            except:
-                pass
+    column_name_list = [affected_feature_file_name+'_period_'+str(i) for i in range(0, periods+1)]
+    new_df = events[column_name_list]
+    new_df.insert(0, 'News_'+monthly_news_file_name, events['News'].astype(float))
     new_df.set_index(monthly_news_df.index, inplace=True)                
     new_df = new_df.astype(float)
     return new_df
@@ -1182,8 +1538,9 @@ def feature_analysis(path_features:str, files_name:list, power_number:int, path_
     
     
     The function takes in the paths and names of feature and target files, and creates non-linear features of the given power for the features.
-    It then combines the features with the target data, and creates lagged versions of each feature.
-    Finally, it calculates the correlation coefficients of each feature with the target for each lag and saves the results in csv files in the specified directory.
+    It then combines the features with the target data, and calculates the correlation coefficients of each feature with the target shifted by 0 to lags_number-1 rows,
+    for all the lags at once with lagged_correlation. The lagged rows are named 'lag<number>_<feature>', the unlagged rows keep the feature name.
+    Finally, it saves the results in csv files in the specified directory.
     The output DataFrame contains the correlation coefficients of each feature with the target, sorted in descending order of correlation coefficients.
     '''
     for feature_file_name in files_name:
@@ -1205,28 +1562,18 @@ def feature_analysis(path_features:str, files_name:list, power_number:int, path_
     
         for n in range(len(my_target)):
             target_df = convert_str_to_float(my_target[n])
-            result_df = pd.DataFrame()
-            for i in range(len(my_df)):
-                df = my_df[i].join(target_df)
-                result_df = get_top_corr_with_gold(df=df, target_file_name=target_file_name).append(result_df)
-                for num in range(0, lags_number):
-                    try:
-                        df.rename(columns = {target_file_name:'target'}, inplace = True)
-                        df['target'] = df.target.shift(-num)
-                        df.rename(columns = {'target':target_file_name}, inplace = True)
-                    except:
-                        df.rename(columns = {target_file_name+'_labeled':'target'}, inplace = True)
-                        df['target'] = df.target.shift(-num)
-                        df.rename(columns = {'target':target_file_name+'_labeled'}, inplace = True)
-                    corr_df = get_top_corr_with_gold(df)
-                    pre = 'lag'+str(num)+'_'
-                    corr_df['feature'] = pre + corr_df['feature'].astype(str)
-                    result_df =corr_df.append(result_df)
-                    try:
-                        result_df = result_df.sort_values(by=target_file_name, ascending=False)
-                    except:
-                        result_df = result_df.sort_values(by=target_file_name+"_labeled", ascending=False)
-                        
+            target_column = target_df.columns[0]
+            corr_df = pd.concat([lagged_correlation(df=my_df[i].join(target_df), target=target_column, lags=max(lags_number - 1, 0))
+                                 for i in range(len(my_df))], ignore_index=True)
+            corr_df['corr'] = corr_df['corr'].abs()
+            unlagged_df = corr_df[corr_df['lag'] == 0]
+            # The engine returns the lags 0 to lags_number-1, and still lag 0 when no lag is asked
+            lagged_df = corr_df if lags_number > 0 else corr_df.iloc[0:0]
+            lagged_df = lagged_df.assign(feature='lag' + lagged_df['lag'].astype(str) + '_' + lagged_df['feature'].astype(str))
+            result_df = pd.concat([unlagged_df, lagged_df], ignore_index=True)
+            result_df = result_df.rename(columns={'corr': target_column})[[target_column, 'feature']]
+            result_df = result_df.sort_values(by=target_column, ascending=False)
+
             result_df.to_csv('feature_analysis/'+feature_file_name+'/'+str(feature_file_name)+str(target_name[n])+'.csv', index = False)
     return result_df
 
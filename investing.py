@@ -6,16 +6,31 @@ Script to download and process investing.com data
 
 
 Usage:
-    - how to update all data  (takes 45 minutes)
-        update_investing(method='update-all')
+    - how to update all data  (4 browsers in parallel by default)
+        update_investing(method='update-all', workers=4)
     
     - how to update a country data  (takes less than 10 minutes)
         update_investing(method='update-country', country='USD')
         X, y = get_investing(country='USD', timeframe='1w')
     
+    - how to get several timeframes of a series, each computed once per process
+        bars = get_timeframes('Gold', ['1d', '1w', '1M', '1Q', 'W-FRI'])
+    
+    - how to update several countries, shared features are downloaded once
+        update_investing(method='update-country', country=['USD', 'CAD', 'JPY'])
+    
+    - how to choose how pages are fetched ('auto' tries plain HTTP first, then Chrome)
+        update_investing(method='update-all', backend='http')
+    
+    - how to update against a local server serving saved historical-data pages
+        update_many(['EURUSD', 'Gold'], backend='http', base_url='http://127.0.0.1:8000')
+    
+    - how to update offline from recorded pages (same paths as on investing.com)
+        update_many(['EURUSD'], backend=RecordedBackend('fixtures/investing'))
+    
     - how to update a single series (takes less than 1 minutes)
         update_investing(method=None, name='US Dollar Index')  
-        dxy =pd.read_csv("investing_data/US Dollar Index.csv")
+        dxy = load_investing_data("US Dollar Index")
         dxy = clean_investing_data(dxy, timeframe)
 """
 
@@ -24,15 +39,21 @@ Usage:
 ## Import Libraries
 import os
 import io
-from time import sleep
-import shutil
+import gzip
+import http.client
+from time import sleep, monotonic
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from urllib.parse import urlsplit, urlunsplit
 
-from webdriver_manager.chrome import ChromeDriverManager 
-from selenium.webdriver.chrome.service import Service 
-from selenium import webdriver 
 import pandas as pd 
 import numpy as np
 
+from data_loader import (load_investing_data, clean_raw_investing_data, drop_duplicate_dates,
+                         compact_investing_data, append_investing_data)
+
 import logging 
 import warnings
 warnings.filterwarnings('ignore')
@@ -45,17 +66,11 @@ logger = logging.getLogger(__name__)
 
 # Helper functions
 
-def make_folder(path):
-    """Create folder if it doesn't exist"""
-    if not os.path.exists(path):
-        os.mkdir(path)
-
-def delete_folder(path):
-    """Delete folder"""
-    try:
-        shutil.rmtree(path) 
-    except OSError as e:
-        print(f"Error: {e}")
+@lru_cache(maxsize=None)
+def chromedriver_path():
+    """Resolve (and download if needed) the chromedriver binary once per process"""
+    from webdriver_manager.chrome import ChromeDriverManager
+    return ChromeDriverManager().install()
 
 
 def driver_config(output: str= "", page_load_strategy: str= "normal"):
@@ -65,8 +80,12 @@ def driver_config(output: str= "", page_load_strategy: str= "normal"):
     - Set download directory
     - Headless mode
     - Other preferences like disabling popups
+    Selenium is imported here, so only the Chrome backend needs it installed.
     """
     
+    from selenium.webdriver.chrome.service import Service
+    from selenium import webdriver
+    
     options = webdriver.ChromeOptions()
     options.add_experimental_option("excludeSwitches", ["enable-automation"])
     options.add_experimental_option('useAutomationExtension', False)
@@ -84,67 +103,371 @@ def driver_config(output: str= "", page_load_strategy: str= "normal"):
     options.add_experimental_option("prefs",prefs)
     
     
-    s=Service(ChromeDriverManager().install())
+    s=Service(chromedriver_path())
     driver = webdriver.Chrome(service=s, options=options,)
     driver.maximize_window()
 
     return driver
 
+class DriverPool:
+    """
+    Small pool of long-lived Chrome drivers shared by the update threads:
+    - Drivers are started lazily, at most `size` of them
+    - Each driver is used by one thread at a time
+    - A driver that raised during a page load is quit and replaced
+    - close() quits all of them
+    """
+    
+    def __init__(self, size: int = 2, driver_factory=driver_config):
+        self.size = size
+        self.driver_factory = driver_factory
+        self._idle = []
+        self._drivers = []
+        # Drivers started or starting, a discarded driver frees its slot
+        self._slots_used = 0
+        self._available = threading.Condition()
+    
+    def _acquire(self):
+        with self._available:
+            while not self._idle and self._slots_used >= self.size:
+                self._available.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._slots_used += 1
+        
+        try:
+            driver = self.driver_factory()
+        except Exception:
+            self._free_slot()
+            raise
+        
+        with self._available:
+            self._drivers.append(driver)
+        return driver
+    
+    def _free_slot(self):
+        with self._available:
+            self._slots_used -= 1
+            self._available.notify()
+    
+    def _release(self, driver):
+        with self._available:
+            self._idle.append(driver)
+            self._available.notify()
+    
+    def _discard(self, driver):
+        with self._available:
+            if driver in self._drivers:
+                self._drivers.remove(driver)
+                self._slots_used -= 1
+            self._available.notify()
+        try:
+            driver.quit()
+        except Exception:
+            pass
+    
+    @contextmanager
+    def driver(self):
+        """Borrow a driver for the duration of a with block, waiting for one if `size` are in use"""
+        driver = self._acquire()
+        try:
+            yield driver
+        except Exception:
+            self._discard(driver)
+            raise
+        else:
+            self._release(driver)
+    
+    def close(self):
+        """Quit all drivers"""
+        with self._available:
+            drivers, self._drivers, self._idle = self._drivers, [], []
+            self._slots_used -= len(drivers)
+            self._available.notify_all()
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+
+class HostRateLimiter:
+    """Space out requests to the same host by at least min_interval seconds"""
+    
+    def __init__(self, min_interval: float = 1.0):
+        self.min_interval = min_interval
+        self._next_slot = dict()
+        self._lock = threading.Lock()
+    
+    def wait(self, url: str):
+        """Block until a request to the host of url is allowed"""
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        sleep(max(0.0, slot - now))
+
+
+def page_url(file: str, base_url: str = None) -> str:
+    """
+    URL of the historical-data page of a file:
+    - urls[file] by default
+    - Same path on base_url, e.g. a local stand-in serving saved pages
+    """
+    url = urls[file]
+    if base_url is None:
+        return url
+    
+    base, parts = urlsplit(base_url), urlsplit(url)
+    return urlunsplit((base.scheme, base.netloc, base.path.rstrip('/') + parts.path, parts.query, ''))
+
+
+def extract_price_table(page_source: str) -> pd.DataFrame:
+    """
+    Extract the historical-data table of an investing.com page:
+    - Parse the page source once, in memory
+    - Only tables mentioning 'Price' are converted to DataFrames
+    - Return the first one with a 'Price' column
+    """
+    
+    tables = pd.read_html(io.StringIO(page_source), match='Price')
+    
+    for df in tables:
+        if 'Price' in df.columns:
+            return df
+    
+    raise ValueError("no table with a 'Price' column in the page")
+
+
 def extract_investing_data(driver, url):
     """
-    Extract investing.com data:
+    Extract investing.com data with a Chrome driver:
     - Load page
-    - Save HTML to file
-    - Read tables from HTML into pandas DataFrame
+    - Read the price table from the page source
     - Return DataFrame
+    The driver is left open, its owner quits it.
     """
     
-    make_folder('html')
     driver.get(url)
     sleep(1)
+    
+    return extract_price_table(driver.page_source)
+
+
+# Fetch backends
+#
+# A backend turns a historical-data URL into the price table of the page.
+# They all have fetch(url) -> DataFrame and close(), and are safe to share
+# between the threads of update_many.
 
-    with io.open("html/temp.html", "w",encoding='utf-8') as f:
-            f.write(driver.page_source)
+class SeleniumBackend:
+    """Fetch pages with a pool of Chrome drivers, for pages that need JavaScript"""
     
-    driver.quit()
+    def __init__(self, size: int = 2, driver_factory=driver_config):
+        self.pool = DriverPool(size=size, driver_factory=driver_factory)
     
-    for i in range(4):
-        df = pd.read_html('html/temp.html')[i]
-        if 'Price' in df.columns: break
+    def fetch(self, url: str) -> pd.DataFrame:
+        with self.pool.driver() as driver:
+            return extract_investing_data(driver, url)
+    
+    def close(self):
+        self.pool.close()
+
+
+class HttpBackend:
+    """
+    Fetch pages with plain HTTP, for pages whose table is in the static HTML:
+    - One keep-alive connection per host and thread, reused between requests
+    - gzip responses are decoded
+    - Anything but a 200 response raises an IOError
+    """
+    
+    headers = {'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 '
+                             '(KHTML, like Gecko) Chrome/116.0 Safari/537.36',
+               'Accept': 'text/html,application/xhtml+xml',
+               'Accept-Encoding': 'gzip',
+               'Connection': 'keep-alive'}
+    
+    def __init__(self, timeout: float = 30):
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+    
+    def _connection(self, scheme: str, netloc: str):
+        connections = self._local.__dict__.setdefault('connections', dict())
+        if (scheme, netloc) not in connections:
+            connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+            connections[(scheme, netloc)] = connection_class(netloc, timeout=self.timeout)
+            with self._lock:
+                self._connections.append(connections[(scheme, netloc)])
+        return connections[(scheme, netloc)]
+    
+    def get(self, url: str) -> str:
+        """Return the body of url as text"""
+        parts = urlsplit(url)
+        target = urlunsplit(('', '', parts.path or '/', parts.query, ''))
         
-    delete_folder('html')
+        # A kept-alive connection may have been closed by the server, retry once on a new one
+        for attempt in range(2):
+            connection = self._connection(parts.scheme, parts.netloc)
+            try:
+                connection.request('GET', target, headers=self.headers)
+                response = connection.getresponse()
+                body = response.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                connection.close()
+                if attempt:
+                    raise
+        
+        if response.status != 200:
+            raise IOError(f"GET {url} returned HTTP {response.status}")
+        if response.getheader('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        
+        return body.decode(response.headers.get_content_charset() or 'utf-8', errors='replace')
+    
+    def fetch(self, url: str) -> pd.DataFrame:
+        return extract_price_table(self.get(url))
     
-    return df
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
 
 
+class RecordedBackend:
+    """
+    Serve pages saved on disk, e.g. HTML fixtures for offline runs:
+    the page of https://www.investing.com/currencies/eur-usd-historical-data
+    is read from <folder>/currencies/eur-usd-historical-data(.html)
+    """
+    
+    def __init__(self, folder: str):
+        self.folder = folder
+    
+    def fetch(self, url: str) -> pd.DataFrame:
+        file = os.path.join(self.folder, *urlsplit(url).path.strip('/').split('/'))
+        if not os.path.exists(file):
+            file += '.html'
+        with io.open(file, encoding='utf-8') as f:
+            return extract_price_table(f.read())
+    
+    def close(self):
+        pass
+
 
-def update_data(file: str) -> None:
+class FallbackBackend:
+    """Try each backend in turn, until one returns the price table"""
+    
+    def __init__(self, *backends):
+        if not backends:
+            raise ValueError("FallbackBackend needs at least one backend")
+        self.backends = backends
+    
+    def fetch(self, url: str) -> pd.DataFrame:
+        for backend in self.backends:
+            try:
+                return backend.fetch(url)
+            except Exception as e:
+                error = e
+                logger.warning(f"{type(backend).__name__} failed on {url}: {str(e)}")
+        raise error
+    
+    def close(self):
+        for backend in self.backends:
+            backend.close()
+
+
+def make_backend(backend='auto', workers: int = 1, driver_factory=driver_config):
+    """
+    Build a fetch backend from its name:
+    - 'http': plain HTTP only
+    - 'selenium': Chrome only, `workers` drivers
+    - 'auto': plain HTTP, Chrome as a fallback (started only if needed)
+    Backend objects are returned as they are.
+    """
+    
+    if not isinstance(backend, str):
+        return backend
+    if backend == 'http':
+        return HttpBackend()
+    if backend == 'selenium':
+        return SeleniumBackend(size=workers, driver_factory=driver_factory)
+    if backend == 'auto':
+        return FallbackBackend(HttpBackend(), SeleniumBackend(size=workers, driver_factory=driver_factory))
+    raise ValueError(f"unknown backend {backend}, use 'http', 'selenium' or 'auto'")
+
+
+
+def update_data(file: str, backend='auto', limiter: HostRateLimiter = None,
+                base_url: str = None, path: str = 'investing_data'):
     """
     Update a single Investing.com data file:
-    - Load existing CSV data
-    - Extract new data
-    - Concat old and new data
-    - Save updated CSV
+    - Clean up the CSV once if older full rewrites left junk index columns in it
+    - Extract new data with the fetch backend (a backend name builds a one-off backend)
+    - Append only the rows newer than the last stored date
+    Returns the number of new rows, None if the update failed.
     """
 
+    own_backend = isinstance(backend, str)
+    backend = make_backend(backend)
+        
     try:
       
-      # Load existing data
-      df1 = pd.read_csv(f"investing_data/{file}.csv") 
+      # Drop junk columns and duplicated dates, only needed once per file
+      compact_investing_data(file, path)
     
       # Get new data    
-      df2 = extract_investing_data(driver_config(), urls[file])
+      url = page_url(file, base_url)
+      if limiter is not None:
+          limiter.wait(url)
       
-      # Concat old and new data
-      df = pd.concat([df1, df2])
+      df = backend.fetch(url)
       
-      # Save updated CSV
-      df.to_csv(f"investing_data/{file}.csv")
+      # Append the new rows to the tail of the CSV
+      new_rows = append_investing_data(file, df, path)
       
-      print(f"{file} data updated successfully")
+      print(f"{file} data updated successfully ({new_rows} new rows)")
+      return new_rows
           
     except Exception as e:
       logger.error(f"{file} data failed to update: {str(e)}")
+      return None
+    
+    finally:
+      if own_backend:
+          backend.close()
+
+
+def update_many(files, workers: int = 4, min_interval: float = 1.0, base_url: str = None,
+                backend='auto', driver_factory=driver_config, path: str = 'investing_data') -> dict:
+    """
+    Update several Investing.com data files concurrently:
+    - Repeated names are updated once
+    - Up to `workers` pages are fetched at the same time by one shared backend
+      (see make_backend, Chrome drivers are pooled and reused)
+    - Requests to the same host are spaced by at least min_interval seconds
+    - base_url sends the requests to another server (see page_url)
+    Returns {file: number of new rows, None if the update failed}.
+    """
+    
+    files = list(dict.fromkeys(file for file in files if file))
+    own_backend = isinstance(backend, str)
+    backend = make_backend(backend, workers=workers, driver_factory=driver_factory)
+    limiter = HostRateLimiter(min_interval)
+    
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(lambda file: update_data(file, backend=backend, limiter=limiter,
+                                                            base_url=base_url, path=path), files)
+            return dict(zip(files, results))
+    finally:
+        if own_backend:
+            backend.close()
 
 def get_features():
     features=dict()
@@ -180,24 +503,42 @@ def get_features():
     
     return features
 
+def get_country_files(country):
+    """
+    Files to update for one or more countries:
+    - country is a code ('USD'), a pair ('EURUSD') or a list of codes
+    - US Dollar Index, the USD pair of each currency and its features
+    Files shared between countries (VIX, NASDAQ, CRB, ...) are listed once.
+    """
+    
+    if isinstance(country, str):
+        country = [country[i:i+3] for i in range(0, len(country), 3)]
+    
+    features = get_features()
+    files = ['US Dollar Index']
+    
+    for code in country:
+        if code != 'USD':
+            files.append('USD' + code if code in ['CAD', 'JPY', 'SEK', 'CHF'] else code + 'USD')
+        files.extend(features.get(code, []))
+    
+    return list(dict.fromkeys(files))
+
 def get_country_index(country, timeframe='1d'):
     
-    dxy =pd.read_csv("investing_data/US Dollar Index.csv")
-    dxy = clean_investing_data(dxy, timeframe)
+    dxy = get_timeframes("US Dollar Index", [timeframe])[timeframe]
     if country == 'USD':
         country_index =dxy
 
     else:
         if country in ['CAD', 'JPY', 'SEK', 'CHF']:
             Ticker = 'USD' + country
-            df = pd.read_csv(f"investing_data/{Ticker}.csv")
-            df = clean_investing_data(df, timeframe)
+            df = get_timeframes(Ticker, [timeframe])[timeframe]
             df=df[['Open', 'High', 'Low', 'Close']]
             country_index = dxy/df
         else:
             Ticker = country + 'USD'
-            df = pd.read_csv(f"investing_data/{Ticker}.csv")
-            df = clean_investing_data(df, timeframe)
+            df = get_timeframes(Ticker, [timeframe])[timeframe]
             df=df[['Open', 'High', 'Low', 'Close']]
             country_index = df*dxy
             
@@ -208,84 +549,88 @@ def get_country_index(country, timeframe='1d'):
 
 # Main functions
 
-def update_investing(method, name=None, country=None):
+def update_investing(method, name=None, country=None, workers=4, backend='auto', base_url=None):
     """
     Wrapper function to call update_data for:
     - All files
     - Single file
-    - All files for a country
+    - All files for one or more countries
+    Several files are updated concurrently by update_many, with `workers` threads.
+    backend selects how pages are fetched: 'auto', 'http', 'selenium' or a backend object.
     """
     
     if method=='update-all':
-        for file in list(urls.keys()):
-            update_data(file)
+        return update_many(list(urls.keys()), workers=workers, backend=backend, base_url=base_url)
             
     elif method=='update-country':
-        # Parse country code
-        country1, country2 = country[:3], country[3:]
-        
-        # Handle special case of USD
-        if country1=='USD': 
-            country1='US Dollar Index'
-            
-        if country2=='USD':
-            country2='US Dollar Index'
-            
-        # Update country level data    
-        update_data(country1)
-        update_data(country2)
-        
-        # Update all features for this country
-        features=get_features()
-        
-        for file in features[country]:
-            update_data(file)
+        # Country level data and features, each file once
+        return update_many(get_country_files(country), workers=workers, backend=backend, base_url=base_url)
             
     else:
         # Update single file
-        update_data(name)
+        return update_data(name, backend=backend, base_url=base_url)
         
 
         
-def clean_investing_data(df, timeframe='1d'):
+def resample_ohlc(df, timeframe='1d'):
+    """
+    Aggregate daily Open/High/Low/Close bars to a timeframe and add 'Mean' and 'diff':
+    - '1d' keeps the daily bars, '1w', '1M' and '1Q' are the names in TIMEFRAMES
+    - Any other timeframe is used as a pandas period frequency (custom anchors like 'W-FRI' or 'Q-NOV')
+    - Bars are indexed by period, periods without any bar are dropped
+    - A duplicated date keeps its last row (see drop_duplicate_dates) before anything is computed
+    """
     
-    # Set index to date
-    df.index = pd.to_datetime(df["Date"])
+    df = drop_duplicate_dates(df)
+    rule = TIMEFRAMES.get(timeframe, timeframe)
+    if rule is not None:
+        df=df.resample(rule, convention='end', kind='period').agg({'Open':'first', 'High':'max', 
+                                              'Low':'min', 'Close':'last'})
+    else:
+        df = df.copy()
+    df['Mean'] = np.mean(pd.concat((df['Low'], df['High'], df['Close']), axis=1), axis=1)
+    df['diff'] = df['Mean'] - df['Mean'].shift(1)
     
-    # Sort DataFrame by index
-    df.sort_index(axis=0, ascending=True, inplace=True)
+    return df[['Open', 'Low', 'High', 'Close', 'Mean', 'diff']].dropna()
+
+
+def clean_investing_data(df, timeframe='1d'):
+    
+    # Raw CSV frames still carry the 'Date' column and string prices,
+    # frames from load_investing_data are already indexed and converted
+    if 'Date' in df.columns:
+        df = clean_raw_investing_data(df)
     
     # Rename 'Price' column to 'Close' for consistency
-    df['Close'] = df['Price']
+    df = df.rename(columns={'Price': 'Close'})[['Open', 'High', 'Low', 'Close']]
     
-    # Drop unnecessary columns
-    try:
-        df = df.drop(columns=["Date", "Change %", "Vol.", "Price"])
-    except:
-        df = df.drop(columns=["Date", "Change %", "Price"])
+    return resample_ohlc(df, timeframe)
+
+
+def get_timeframes(name, timeframes=('1d',), path='investing_data'):
+    """
+    Return {timeframe: cleaned bars} of an instrument for several timeframes:
+    - The CSV is loaded and cleaned once for all the timeframes
+    - Results are memoized per file and timeframe in TIMEFRAME_CACHE, until the CSV changes
+    - Callers get copies, so they can modify them freely
+    """
     
-    try: 
-        df = df.drop(columns=['Unnamed: 0'])
-    except: 
-        pass
-        
+    if isinstance(timeframes, str):
+        timeframes = [timeframes]
     
-    # Clean data by removing commas and converting to float
-    for column in df.columns:
-        for k in range(len(df[column])):
-            if type(df[column][k]) == str:
-                df[column][k] = df[column][k].replace(",","")
-        df[column] = df[column].astype(float)   
+    stat = os.stat(os.path.join(path, name + '.csv'))
+    source = (os.path.abspath(os.path.join(path, name + '.csv')), stat.st_size, stat.st_mtime_ns)
     
-    #Change to 1w timeframe
-    if timeframe=='1w':
-        df=df.resample('W-MON', convention='end', kind='period').agg({'Open':'first', 'High':'max', 
-                                              'Low':'min', 'Close':'last'})
-    df['Mean'] = np.mean(pd.concat((df['Low'], df['High'], df['Close']), axis=1), axis=1)
-    df['diff'] = df['Mean'] - df['Mean'].shift(1)
-    df = df.loc[~df.index.duplicated()]
+    missing = [timeframe for timeframe in timeframes if (source, timeframe) not in TIMEFRAME_CACHE]
+    if missing:
+        # Drop the entries of older versions of the file
+        for key in [key for key in TIMEFRAME_CACHE if key[0][0] == source[0] and key[0] != source]:
+            del TIMEFRAME_CACHE[key]
+        daily = load_investing_data(name, path=path).rename(columns={'Price': 'Close'})[['Open', 'High', 'Low', 'Close']]
+        for timeframe in missing:
+            TIMEFRAME_CACHE[(source, timeframe)] = resample_ohlc(daily, timeframe)
     
-    return df[['Open', 'Low', 'High', 'Close', 'Mean', 'diff']].dropna()
+    return {timeframe: TIMEFRAME_CACHE[(source, timeframe)].copy() for timeframe in timeframes}
 
 
 
@@ -296,8 +641,7 @@ def get_investing(country, timeframe='1d'):
     features=get_features()[country]
     
     for feature in features:
-        df =pd.read_csv(f"investing_data/{feature}.csv")
-        df = clean_investing_data(df, timeframe)
+        df = get_timeframes(feature, [timeframe])[timeframe]
         X.append(df)
     
     y=get_country_index(country, timeframe)
@@ -367,4 +711,13 @@ urls={
 "VIX": 'https://www.investing.com/indices/volatility-s-p-500-historical-data',
 }
 
+# Timeframe name -> pandas period frequency used by resample_ohlc, None keeps the daily bars
+TIMEFRAMES = {'1d': None,
+              '1w': 'W-MON',
+              '1M': 'M',
+              '1Q': 'Q'}
+
+# (file, size, mtime), timeframe -> bars, filled by get_timeframes
+TIMEFRAME_CACHE = {}
+
 
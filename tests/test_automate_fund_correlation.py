@@ -0,0 +1,57 @@
+"""
+Checks of the correlation engines of automate_fund_correlation against pandas, on small in-memory frames.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from automate_fund_correlation import PearsonIndex, correlation_matrix, rolling_correlation
+
+
+def instruments_with_different_dates():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.standard_normal((300, 5)).cumsum(axis=0).round(1), columns=list('ABCDE'),
+                      index=pd.date_range('2020-01-01', periods=300))
+    # A and B start later, C stops earlier, D has a gap
+    df.iloc[:80, [0, 1]] = np.nan
+    df.iloc[220:, 2] = np.nan
+    df.iloc[100:130, 3] = np.nan
+    return df
+
+
+def test_spearman_matrix_ranks_every_pair_on_its_shared_rows():
+    df = instruments_with_different_dates()
+    spearman = correlation_matrix(df, methods=('spearman',))['spearman']
+    assert np.allclose(spearman, df.corr(method='spearman'), atol=1e-12, equal_nan=True)
+    assert np.isclose(spearman.loc['A', 'C'], df[['A', 'C']].dropna().rank().corr().loc['A', 'C'])
+
+
+def test_rolling_spearman_matches_the_spearman_of_complete_windows():
+    df = instruments_with_different_dates()
+    rolling = rolling_correlation(df, 30, pairs=[('A', 'C'), ('D', 'E')], method='spearman')
+    for column, (first, second) in zip(rolling.columns, [('A', 'C'), ('D', 'E')]):
+        for end in range(29, len(df)):
+            window = df[[first, second]].iloc[end - 29:end + 1]
+            if window.notna().all().all():
+                assert np.isclose(rolling[column].iloc[end], window.corr(method='spearman').iloc[0, 1])
+            else:
+                assert np.isnan(rolling[column].iloc[end])
+
+
+def test_pearson_index_year_and_month_end_bounds_cover_the_whole_period():
+    rng = np.random.default_rng(1)
+    dates = pd.date_range('2019-06-01', '2021-06-30')
+    x = pd.Series(rng.standard_normal(len(dates)).cumsum(), index=dates)
+    y = pd.Series(rng.standard_normal(len(dates)).cumsum(), index=dates)
+    index = PearsonIndex(x, y)
+
+    for start, end in [('2020', '2020'), ('2019', '2020'), ('2020-02', '2020-02'), ('2020-01-01', '2020-12-31')]:
+        both = pd.concat([x, y], axis=1)[start:end]
+        assert index.count(start, end) == len(both)
+        assert np.isclose(index.corr(start, end), both[0].corr(both[1]))
+    assert index.count('2020', '2020') == 366
+    assert np.allclose(index.corr_many(['2019', '2020'], ['2019', '2020']), index.yearly().loc[[2019, 2020]])
@@ -0,0 +1,65 @@
+"""
+Checks of data_loader on small CSVs written in a temporary folder.
+"""
+
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_loader import Panel, compact_investing_data, load_investing_data, parse_numeric
+from fund_analysis_function import align_frames
+
+
+def test_parse_numeric_keeps_missing_cells():
+    column = pd.Series(['1,002.60', np.nan, '-0.66%', '1.07B', None])
+    for errors in ('coerce', 'raise'):
+        values = parse_numeric(column, errors=errors)
+        assert np.allclose(values, [1002.6, np.nan, -0.66, 1.07e9, np.nan], equal_nan=True)
+
+    with pytest.raises(ValueError):
+        parse_numeric(pd.Series(['1.0', 'n/a']), errors='raise')
+
+
+def test_duplicated_dates_keep_the_last_row_everywhere(tmp_path):
+    (tmp_path / 'A.csv').write_text(',Unnamed: 0,Date,Price,Open,High,Low,Vol.,Change %\n'
+                                    '0,0,01/02/2023,1.0,1.0,1.0,1.0,,0.00%\n'
+                                    '1,1,01/03/2023,2.0,2.0,2.0,2.0,,1.00%\n'
+                                    '2,2,01/03/2023,3.0,3.0,3.0,3.0,,2.00%\n')
+    (tmp_path / 'B.csv').write_text('Date,Price,Open,High,Low,Vol.,Change %\n'
+                                    '01/02/2023,5.0,5.0,5.0,5.0,,0.00%\n'
+                                    '01/03/2023,6.0,6.0,6.0,6.0,,0.00%\n')
+
+    panel = Panel.load(['A', 'B'], path=str(tmp_path))
+    aligned = align_frames([load_investing_data('B', path=str(tmp_path)),
+                            load_investing_data('A', path=str(tmp_path))[['Price']].rename(columns={'Price': 'A'})])
+    assert compact_investing_data('A', path=str(tmp_path))
+    compacted = load_investing_data('A', path=str(tmp_path))
+
+    assert compacted['Price'].tolist() == [1.0, 3.0]
+    assert panel.to_frame('Close')['A'].tolist() == [1.0, 3.0]
+    assert aligned['A'].tolist() == [1.0, 3.0]
+
+
+def test_threads_writing_the_same_cache_entry(tmp_path):
+    rows = ''.join(f'01/{day:02d}/2023,{day}.0,{day}.0,{day}.0,{day}.0,,0.00%\n' for day in range(1, 29))
+    (tmp_path / 'A.csv').write_text('Date,Price,Open,High,Low,Vol.,Change %\n' + rows)
+
+    # Every thread misses the cache and writes the entry
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        frames = list(executor.map(lambda _: load_investing_data('A', path=str(tmp_path)), range(32)))
+
+    cache_files = os.listdir(tmp_path / '.cache')
+    assert [file for file in cache_files if file.endswith('.tmp')] == []
+    assert all(frame.equals(frames[0]) for frame in frames)
+    assert load_investing_data('A', path=str(tmp_path)).equals(frames[0])
+
+
+def test_panel_without_instruments_is_empty(tmp_path):
+    for panel in (Panel.load([], path=str(tmp_path)), Panel.load(path=str(tmp_path))):
+        assert panel.values.shape == (0, 0, 4)
+        assert panel.to_frame('Close').empty
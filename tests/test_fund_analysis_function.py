@@ -0,0 +1,45 @@
+"""
+Checks of fund_analysis_function on small in-memory frames.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fund_analysis_function import convert_str_to_float, get_top_abs_correlations, lagged_correlation
+
+
+def test_convert_str_to_float_keeps_missing_cells():
+    df = convert_str_to_float(pd.DataFrame({'Price': ['1,002.60', np.nan, '998.1']}))
+    assert np.allclose(df['Price'], [1002.6, np.nan, 998.1], equal_nan=True)
+
+
+def test_get_top_abs_correlations_counts():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.standard_normal((50, 5)).cumsum(axis=0), columns=list('ABCDE'))
+
+    assert get_top_abs_correlations(df, 0).empty
+    assert get_top_abs_correlations(df, -3).empty
+    assert len(get_top_abs_correlations(df, 3)) == 3
+    assert len(get_top_abs_correlations(df, 100)) == 10
+
+    expected = df.corr().abs().where(np.triu(np.ones((5, 5), dtype=bool), k=1)).stack().sort_values(ascending=False)
+    assert get_top_abs_correlations(df, 4).round(12).tolist() == expected[:4].round(12).tolist()
+
+
+def test_lagged_correlation_matches_shifted_pandas_correlations():
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame(rng.standard_normal((200, 3)).cumsum(axis=0), columns=['A', 'B', 'target'])
+    df = df.mask(rng.random(df.shape) < 0.2)
+    df['constant'] = 7.0
+
+    result = lagged_correlation(df, 'target', lags=5)
+    for lag in range(6):
+        shifted = df.assign(target=df['target'].shift(-lag))
+        expected = shifted.corr()['target'].drop('target')
+        corr = result[result['lag'] == lag].set_index('feature')['corr']
+        assert np.allclose(corr.reindex(expected.index), expected, atol=1e-12, equal_nan=True)
+    assert result.loc[result['feature'] == 'constant', 'corr'].isna().all()
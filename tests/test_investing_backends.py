@@ -0,0 +1,216 @@
+"""
+Offline checks of the investing.com fetch path, against the recorded page in tests/fixtures/investing.
+"""
+
+import os
+import sys
+import gzip
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import investing
+from investing import (extract_price_table, page_url, update_many, make_backend,
+                       DriverPool, HttpBackend, RecordedBackend, FallbackBackend, SeleniumBackend)
+
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'investing')
+PAGE = os.path.join(FIXTURES, 'currencies', 'eur-usd-historical-data.html')
+
+
+class FailingBackend:
+    def fetch(self, url):
+        raise IOError(f"cannot fetch {url}")
+
+    def close(self):
+        pass
+
+
+class FakeDriver:
+    """Chrome driver stand-in serving the recorded page, failing on the URLs in `failing`"""
+
+    def __init__(self, failing=()):
+        self.failing = failing
+        self.quit_called = False
+        self.page_source = ''
+
+    def get(self, url):
+        if url in self.failing:
+            # Slow failure, the other threads are waiting for a driver by then
+            time.sleep(0.2)
+            raise IOError(f"cannot load {url}")
+        with open(PAGE, encoding='utf-8') as f:
+            self.page_source = f.read()
+
+    def quit(self):
+        self.quit_called = True
+
+
+def run_with_timeout(target, timeout=10):
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "deadlock"
+
+
+class RecordedPageHandler(BaseHTTPRequestHandler):
+    """Local stand-in for investing.com, serving the recorded pages over keep-alive HTTP/1.1"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        file = os.path.join(FIXTURES, *self.path.strip('/').split('/')) + '.html'
+        if not os.path.exists(file):
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        with open(file, 'rb') as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def base_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RecordedPageHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_extract_price_table_skips_tables_without_price():
+    with open(PAGE, encoding='utf-8') as f:
+        df = extract_price_table(f.read())
+    assert list(df.columns) == ['Date', 'Price', 'Open', 'High', 'Low', 'Vol.', 'Change %']
+    assert df['Date'].tolist() == ['10/13/2023', '10/12/2023', '10/11/2023']
+
+
+def test_recorded_backend_reads_the_page_of_the_url_path():
+    df = RecordedBackend(FIXTURES).fetch(page_url('EURUSD'))
+    assert df['Price'].tolist() == [1.0510, 1.0530, 1.0620]
+
+
+def test_fallback_backend_tries_the_next_backend():
+    backend = FallbackBackend(FailingBackend(), RecordedBackend(FIXTURES))
+    assert len(backend.fetch(page_url('EURUSD'))) == 3
+
+    with pytest.raises(IOError):
+        FallbackBackend(FailingBackend()).fetch(page_url('EURUSD'))
+
+
+def test_fallback_backend_needs_a_backend():
+    with pytest.raises(ValueError):
+        FallbackBackend()
+
+
+def test_update_many_appends_only_the_new_recorded_rows(tmp_path):
+    csv_path = tmp_path / 'EURUSD.csv'
+    csv_path.write_text('Date,Price,Open,High,Low,Vol.,Change %\n'
+                        '10/10/2023,1.0605,1.0605,1.0639,1.0591,,0.30%\n'
+                        '10/11/2023,1.0620,1.0605,1.0639,1.0591,,0.14%\n')
+
+    assert update_many(['EURUSD'], workers=1, min_interval=0, backend=RecordedBackend(FIXTURES),
+                       path=str(tmp_path)) == {'EURUSD': 2}
+    assert csv_path.read_text().splitlines()[-2:] == ['10/12/2023,1.053,1.062,1.0639,1.0526,,-0.85%',
+                                                      '10/13/2023,1.051,1.0529,1.0543,1.0496,,-0.19%']
+
+
+def test_http_backend_fetches_the_local_stand_in(base_url):
+    backend = make_backend('http')
+    assert isinstance(backend, HttpBackend)
+    try:
+        # Twice on the same kept-alive connection, the page is sent gzip encoded
+        for _ in range(2):
+            df = backend.fetch(page_url('EURUSD', base_url))
+            assert df['Date'].tolist() == ['10/13/2023', '10/12/2023', '10/11/2023']
+        assert len(backend._connections) == 1
+
+        with pytest.raises(IOError):
+            backend.fetch(base_url + '/currencies/missing-historical-data')
+    finally:
+        backend.close()
+
+
+def test_driver_pool_replaces_a_failed_driver_for_a_waiting_thread():
+    started = []
+
+    def factory():
+        started.append(FakeDriver())
+        return started[-1]
+
+    pool = DriverPool(size=1, driver_factory=factory)
+    borrowed = threading.Event()
+    borrowers = []
+
+    def failing():
+        with pytest.raises(IOError):
+            with pool.driver():
+                borrowed.set()
+                # Let the other thread wait for the only slot
+                time.sleep(0.2)
+                raise IOError("page load failed")
+
+    def waiting():
+        borrowed.wait()
+        with pool.driver() as driver:
+            borrowers.append(driver)
+
+    def both():
+        threads = [threading.Thread(target=failing), threading.Thread(target=waiting)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    run_with_timeout(both)
+    assert len(started) == 2 and started[0].quit_called
+    assert borrowers == [started[1]]
+
+    pool.close()
+    assert started[1].quit_called
+
+
+def test_update_many_survives_failing_drivers(tmp_path, monkeypatch):
+    monkeypatch.setattr(investing, 'sleep', lambda seconds: None)
+    files = ['EURUSD', 'Gold', 'AUDCAD', 'AUDCHF', 'USDJPY', 'Silver']
+    for file in files:
+        (tmp_path / (file + '.csv')).write_text('Date,Price,Open,High,Low,Vol.,Change %\n'
+                                                '10/11/2023,1.0620,1.0605,1.0639,1.0591,,0.14%\n')
+    # Every page load fails, the waiting threads must start replacements
+    failing = {page_url(file) for file in files}
+    live, most_live = [], []
+
+    class CountedDriver(FakeDriver):
+        def quit(self):
+            super().quit()
+            live.remove(self)
+
+    def factory():
+        live.append(CountedDriver(failing))
+        most_live.append(len(live))
+        return live[-1]
+
+    backend = SeleniumBackend(size=2, driver_factory=factory)
+    results = {}
+    run_with_timeout(lambda: results.update(update_many(files, workers=4, min_interval=0, backend=backend,
+                                                        path=str(tmp_path))))
+    backend.close()
+
+    assert results == dict.fromkeys(files)
+    assert max(most_live) <= 2 and not live
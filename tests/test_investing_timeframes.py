@@ -0,0 +1,31 @@
+"""
+Checks of the timeframe aggregation of investing.py on small CSVs written in a temporary folder.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from investing import get_timeframes
+
+
+def test_duplicated_dates_keep_the_last_row_before_resampling(tmp_path):
+    # 2023-01-03 was scraped twice, the second row is the newer one
+    (tmp_path / 'A.csv').write_text('Date,Price,Open,High,Low,Vol.,Change %\n'
+                                    '01/02/2023,10.0,10.0,11.0,9.0,,0.00%\n'
+                                    '01/03/2023,99.0,99.0,99.0,99.0,,0.00%\n'
+                                    '01/03/2023,12.0,11.0,13.0,10.0,,0.00%\n'
+                                    '01/04/2023,14.0,12.0,15.0,11.0,,0.00%\n')
+
+    bars = get_timeframes('A', ['1d', '1w'], path=str(tmp_path))
+
+    daily = bars['1d']
+    assert daily['Close'].tolist() == [12.0, 14.0]
+    assert daily['Mean'].tolist() == pytest.approx([35 / 3, 40 / 3])
+    assert daily['diff'].tolist() == pytest.approx([35 / 3 - 10.0, 5 / 3])
+
+    # Weeks end on Monday 01/02, the first bar has no diff, the second one aggregates 01/03 and 01/04 without the stale row
+    weekly = bars['1w']
+    assert weekly[['Open', 'Low', 'High', 'Close']].values.tolist() == [[11.0, 10.0, 15.0, 14.0]]